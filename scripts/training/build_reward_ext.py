@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time compile the simple contrary motion reward kernel.
+
+Builds reward_ext (a shared library next to this script) from
+simple_contrary_motion_training._run_episodes_py so training runs skip the
+Numba JIT warm-up. simple_contrary_motion_training.py picks it up
+automatically and falls back to Numba JIT / plain Python when it is missing.
+
+Usage:
+    python3 scripts/training/build_reward_ext.py
+"""
+
+import os
+import sys
+
+from numba.pycc import CC
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from simple_contrary_motion_training import _run_episodes_py
+
+def main():
+    """Compile reward_ext into the training scripts directory"""
+    cc = CC('reward_ext')
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # rewards[num_episodes] = f(melody_notes, harmony_notes, first_episode, num_episodes)
+    cc.export('_run_episodes', 'f8[:](i8[:], i8[:,:], i8, i8)')(_run_episodes_py)
+    
+    print("🔧 Compiling reward_ext...")
+    cc.compile()
+    print(f"✅ Built reward_ext in {cc.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -7,79 +7,111 @@ import numpy as np
 import os
 from datetime import datetime
 
-def simple_contrary_motion_reward(melody_note, harmony_note, prev_melody_note, prev_harmony_note):
-    """Simple contrary motion reward calculation"""
-    if prev_melody_note is None or prev_harmony_note is None:
-        return 0.0
-    
-    melody_direction = melody_note - prev_melody_note
-    harmony_direction = harmony_note - prev_harmony_note
-    
-    # Contrary motion: melody and harmony move in opposite directions
-    if melody_direction > 0 and harmony_direction < 0:
-        return 2.0
-    elif melody_direction < 0 and harmony_direction > 0:
-        return 2.0
-    elif melody_direction == 0 and harmony_direction != 0:
-        return 1.0  # Partial reward for static melody
-    else:
-        return 0.0  # No contrary motion
+# Harmony choices relative to the melody note: third below, fifth below, fourth above
+HARMONY_OFFSETS = np.array([-3, -7, 5], dtype=np.int64)
 
-def simple_music_theory_reward(melody_note, harmony_note):
-    """Simple music theory reward"""
-    # Basic consonance reward
-    interval = abs(melody_note - harmony_note) % 12
-    if interval in [0, 3, 4, 7, 8]:  # Unison, minor/major third, perfect fourth/fifth, minor sixth
-        return 1.0
-    else:
-        return 0.5
+# Episodes scored per call into the reward kernel (matches the progress-dot interval)
+EPISODE_BLOCK = 100
 
-def train_simple_contrary_motion(episodes=10000):
+REWARD_HISTORY_FILE = "simple_contrary_motion_reward_history.npy"
+
+# 1.0 for consonant interval classes (unison, minor/major third, perfect fifth, minor sixth)
+_CONSONANT = np.array([1, 0, 0, 1, 1, 0, 0, 1, 1, 0, 0, 0], dtype=np.float32)
+
+def _run_episodes_py(melody_notes, harmony_notes, first_episode, num_episodes):
+    """
+    Score a block of pre-sampled episodes.
+
+    Each step earns a consonance reward (0.5, or 1.0 for a consonant interval
+    with the melody) plus a contrary motion reward (2.0 when melody and
+    harmony move in opposite directions, 1.0 when only the harmony moves).
+    Written over plain integer arrays so it can be compiled by Numba (JIT or
+    AOT via build_reward_ext.py).
+    """
+    num_steps = melody_notes.shape[0]
+    rewards = np.zeros(num_episodes)
+    
+    for e in range(num_episodes):
+        harmony = harmony_notes[first_episode + e]
+        total = 0.0
+        
+        for t in range(num_steps):
+            # Basic consonance reward
+            total += 0.5 + 0.5 * _CONSONANT[abs(melody_notes[t] - harmony[t]) % 12]
+            
+            # Contrary motion reward
+            if t > 0:
+                melody_direction = melody_notes[t] - melody_notes[t - 1]
+                harmony_direction = harmony[t] - harmony[t - 1]
+                if melody_direction > 0 and harmony_direction < 0:
+                    total += 2.0
+                elif melody_direction < 0 and harmony_direction > 0:
+                    total += 2.0
+                elif melody_direction == 0 and harmony_direction != 0:
+                    total += 1.0
+        
+        rewards[e] = total
+    
+    return rewards
+
+# Prefer the ahead-of-time compiled kernel (python3 build_reward_ext.py), then
+# Numba JIT, then plain Python
+try:
+    from reward_ext import _run_episodes
+except ImportError:
+    try:
+        from numba import njit
+        _run_episodes = njit(cache=True)(_run_episodes_py)
+    except ImportError:
+        _run_episodes = _run_episodes_py
+
+def train_simple_contrary_motion(episodes=10000, seed=None):
     """Simple training simulation"""
     print("🎵 SIMPLE CONTRARY MOTION TRAINING")
     print("=" * 50)
     print(f"Episodes: {episodes}")
     print(f"Training started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    rng = np.random.default_rng(seed)
+    
     # Training melody (C major scale)
-    melody_notes = [60, 62, 64, 65, 67, 69, 71, 72]  # C, D, E, F, G, A, B, C
+    melody_notes = np.array([60, 62, 64, 65, 67, 69, 71, 72], dtype=np.int64)  # C, D, E, F, G, A, B, C
     
-    episode_rewards = []
+    # Reward history is written straight into the .npy file as training runs
+    episode_rewards = np.lib.format.open_memmap(REWARD_HISTORY_FILE, mode="w+",
+                                                dtype=np.float32, shape=(episodes,))
+    recent_sum = 0.0  # Sum of the last 1000 episode rewards
     best_reward = float('-inf')
     
     print(f"Training melody: {len(melody_notes)} notes")
     print(f"Starting training...")
     print("Progress: ", end="", flush=True)
     
-    for episode in range(episodes):
-        episode_reward = 0
-        prev_melody_note = None
-        prev_harmony_note = None
+    # Simple harmony generation (random but weighted), sampled for every episode up front
+    harmony_idx = rng.integers(0, len(HARMONY_OFFSETS), size=(episodes, len(melody_notes)))
+    harmony_notes = melody_notes + HARMONY_OFFSETS[harmony_idx]
+    
+    for block_start in range(0, episodes, EPISODE_BLOCK):
+        block_size = min(EPISODE_BLOCK, episodes - block_start)
+        block_end = block_start + block_size
         
-        # Run episode
-        for melody_note in melody_notes:
-            # Simple harmony generation (random but weighted)
-            harmony_options = [melody_note - 3, melody_note - 7, melody_note + 5]  # Third, fifth, fourth
-            harmony_note = np.random.choice(harmony_options)
-            
-            # Calculate rewards
-            music_reward = simple_music_theory_reward(melody_note, harmony_note)
-            contrary_reward = simple_contrary_motion_reward(melody_note, harmony_note, prev_melody_note, prev_harmony_note)
-            total_reward = music_reward + contrary_reward
-            
-            episode_reward += total_reward
-            prev_melody_note = melody_note
-            prev_harmony_note = harmony_note
+        # Run episodes
+        block_rewards = _run_episodes(melody_notes, harmony_notes, block_start, block_size)
+        episode_rewards[block_start:block_end] = block_rewards
         
-        episode_rewards.append(episode_reward)
+        # Slide the 1000-episode window: add the new block, drop what fell out
+        recent_sum += float(block_rewards.sum())
+        if block_end > 1000:
+            recent_sum -= float(episode_rewards[max(0, block_start - 1000):block_end - 1000].sum())
         
         # Track best performance
-        if episode_reward > best_reward:
-            best_reward = episode_reward
+        if block_rewards.max() > best_reward:
+            best_reward = float(block_rewards.max())
         
         # Progress indicator
+        episode = block_end - 1
         if (episode + 1) % 1000 == 0:
-            recent_avg = np.mean(episode_rewards[-1000:])
+            recent_avg = recent_sum / min(1000, block_end)
             print(f"\nEpisode {episode + 1}: Avg reward = {recent_avg:.3f}, Best = {best_reward:.3f}")
             print("Progress: ", end="", flush=True)
         elif (episode + 1) % 100 == 0:
@@ -100,9 +132,9 @@ def save_simple_training_results(episode_rewards, best_reward, episodes):
     """Save training results"""
     print(f"\n💾 SAVING TRAINING RESULTS...")
     
-    # Save reward history
-    reward_file = "simple_contrary_motion_reward_history.npy"
-    np.save(reward_file, np.array(episode_rewards))
+    # Save reward history (already streamed to disk during training)
+    reward_file = REWARD_HISTORY_FILE
+    episode_rewards.flush()
     print(f"✅ Saved reward history: {reward_file}")
     
     # Save training summary
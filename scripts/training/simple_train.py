@@ -57,9 +57,9 @@ class SimpleRLAgent:
         else:
             # Best action
             q_values = self.q_table[state_key]
-            action = np.argmax(q_values)
-            # Convert to multi-voice action
-            action = np.array([action % 88, (action // 88) % 88, (action // (88*88)) % 88])
+            # Convert to multi-voice action (inverse of action_idx in learn(): voice 0 varies fastest)
+            action = np.array(np.unravel_index(int(np.argmax(q_values)), (88, 88, 88), order='F'),
+                              dtype=np.int64)
         
         return action
     
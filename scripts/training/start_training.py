@@ -35,29 +35,31 @@ try:
     
     # Simple training loop
     print("🎵 Starting training...")
-    total_rewards = []
+    num_episodes = 100
+    total_rewards = np.empty(num_episodes, dtype=np.float32)
     
-    for episode in range(100):  # 100 episodes
+    for episode in range(num_episodes):
         state = env.reset()
         episode_reward = 0
-        done = False
         
-        while not done:
-            # Random action
-            action = env.action_space.sample()
-            
+        # Random actions for the whole episode, sampled at once
+        actions = np.random.randint(0, env.action_space.nvec, size=(env.max_steps, env.num_voices))
+        
+        for action in actions:
             # Take step
             next_state, reward, done, info = env.step(action)
             episode_reward += reward
             
             state = next_state
+            if done:
+                break
         
-        total_rewards.append(episode_reward)
+        total_rewards[episode] = episode_reward
         
         # Print progress every 20 episodes
         if (episode + 1) % 20 == 0:
-            avg_reward = np.mean(total_rewards[-20:])
-            print(f"Episode {episode + 1}/100: Avg Reward = {avg_reward:.3f}")
+            avg_reward = total_rewards[episode - 19:episode + 1].mean()
+            print(f"Episode {episode + 1}/{num_episodes}: Avg Reward = {avg_reward:.3f}")
     
     print("✅ Training complete!")
     
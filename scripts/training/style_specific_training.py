@@ -10,11 +10,17 @@ Train the RL model with different reward weights for various musical styles:
 """
 
 import numpy as np
+import itertools
 import json
 import os
 from datetime import datetime
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add src to path
 sys.path.append('src')
 
@@ -53,69 +59,39 @@ STYLE_PRESETS = {
     }
 }
 
-def train_style_specific_model(style_name: str, episodes: int = 5000, melody_file: str = None):
-    """Train a model for a specific musical style"""
-    print(f"🎵 Training {style_name.upper()} style harmonization model")
-    print(f"=" * 60)
-    
-    # Get style-specific weights
-    if style_name not in STYLE_PRESETS:
-        print(f"❌ Unknown style: {style_name}")
-        print(f"Available styles: {list(STYLE_PRESETS.keys())}")
-        return None
-    
-    weights = STYLE_PRESETS[style_name]
-    print(f"🎛️ Style weights: {weights}")
-    
-    # Initialize reward system with style weights
+def _make_env(weights: dict, melody_sequence, seed: int):
+    """Build a style-training environment with the given reward weights"""
     reward_system = MusicTheoryRewards()
     reward_system.set_custom_weights(weights)
-    
-    # Load melody if provided
-    melody_sequence = None
-    if melody_file and os.path.exists(melody_file):
-        import mido
-        mid = mido.MidiFile(melody_file)
-        melody_sequence = []
-        
-        for track in mid.tracks:
-            current_time = 0
-            for msg in track:
-                current_time += msg.time
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    melody_sequence.append(msg.note)
-                    if len(melody_sequence) >= 32:  # Limit length
-                        break
-            if melody_sequence:
-                break
-    
-    # Create environment
-    env = HarmonizationEnvironment(
+    return HarmonizationEnvironment(
         coconet_wrapper=None,  # Not using Coconet for style training
         reward_system=reward_system,
         max_steps=32,
         num_voices=3,
-        melody_sequence=melody_sequence
+        melody_sequence=melody_sequence,
+        seed=seed  # Own generator, so workers' random melodies differ without touching np.random
     )
+
+def _run_style_episodes(weights: dict, melody_sequence, episodes: int, seed: int, report: bool = True):
+    """Run random-action episodes in one environment and return their total rewards"""
+    env = _make_env(weights, melody_sequence, seed)
+    rng = np.random.default_rng(seed)
     
-    # Training parameters
-    learning_rate = 0.0003
-    batch_size = 64
-    
-    # Initialize training
-    reward_history = []
+    reward_history = np.empty(episodes)
     best_reward = -float('inf')
     
-    print(f"🚀 Starting training for {episodes} episodes...")
+    # Exponential moving average of the episode rewards, spanning ~500 episodes
+    ema_alpha = 2.0 / (500 + 1)
+    ema_reward = None
     
     for episode in range(episodes):
         observation = env.reset()
         total_reward = 0
         
-        for step in range(env.max_steps):
-            # Sample action (random for now, could use trained policy)
-            action = env.action_space.sample()
-            
+        # Sample the episode's actions in one call (random for now, could use trained policy)
+        actions = rng.integers(0, env.action_space.nvec, size=(env.max_steps, env.num_voices))
+        
+        for action in actions:
             # Take step
             observation, reward, done, info = env.step(action)
             total_reward += reward
@@ -123,16 +99,52 @@ def train_style_specific_model(style_name: str, episodes: int = 5000, melody_fil
             if done:
                 break
         
-        reward_history.append(total_reward)
+        reward_history[episode] = total_reward
         
         # Track best performance
         if total_reward > best_reward:
             best_reward = total_reward
         
+        if ema_reward is None:
+            ema_reward = total_reward
+        else:
+            ema_reward += ema_alpha * (total_reward - ema_reward)
+        
         # Progress reporting
-        if episode % 500 == 0:
-            avg_reward = np.mean(reward_history[-500:])
-            print(f"Episode {episode:4d} | Avg Reward: {avg_reward:6.2f} | Best: {best_reward:6.2f}")
+        if report and episode % 500 == 0:
+            print(f"Episode {episode:4d} | Avg Reward: {ema_reward:6.2f} | Best: {best_reward:6.2f}")
+    
+    return reward_history
+
+def _write_json(path: str, data: dict):
+    """Write data as indented JSON, with orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+def _load_melody(melody_file: str):
+    """Read up to 32 melody pitches from the first MIDI track with notes"""
+    if not (melody_file and os.path.exists(melody_file)):
+        return None
+    
+    import mido
+    mid = mido.MidiFile(melody_file)
+    
+    for track in mid.tracks:
+        note_ons = (msg.note for msg in track if msg.type == 'note_on' and msg.velocity > 0)
+        melody_sequence = list(itertools.islice(note_ons, 32))  # Limit length
+        if melody_sequence:
+            return melody_sequence
+    
+    return []
+
+def _save_style_model(style_name: str, weights: dict, reward_history: np.ndarray,
+                      best_reward: float, melody_file: str = None):
+    """Save the metadata, reward history and summary of a trained style model"""
+    episodes = len(reward_history)
     
     # Calculate final statistics
     final_avg_reward = np.mean(reward_history[-1000:])
@@ -157,12 +169,11 @@ def train_style_specific_model(style_name: str, episodes: int = 5000, melody_fil
     
     # Save metadata
     metadata_file = f"{output_dir}/model_metadata.json"
-    with open(metadata_file, 'w') as f:
-        json.dump(model_metadata, f, indent=2)
+    _write_json(metadata_file, model_metadata)
     
-    # Save reward history
+    # Save reward history (float32 is plenty for plotting and halves the file)
     reward_file = f"{output_dir}/reward_history.npy"
-    np.save(reward_file, np.array(reward_history))
+    np.save(reward_file, reward_history.astype(np.float32), allow_pickle=False)
     
     # Save training summary
     summary_file = f"{output_dir}/training_summary.txt"
@@ -186,25 +197,131 @@ def train_style_specific_model(style_name: str, episodes: int = 5000, melody_fil
     
     return model_metadata
 
-def train_all_styles(episodes_per_style: int = 3000, melody_file: str = None):
-    """Train models for all available styles"""
+def train_style_specific_model(style_name: str, episodes: int = 5000, melody_file: str = None,
+                               num_envs: int = 1, seed: int = 0, melody_sequence: list = None):
+    """Train a model for a specific musical style"""
+    print(f"🎵 Training {style_name.upper()} style harmonization model")
+    print(f"=" * 60)
+    
+    # Get style-specific weights
+    if style_name not in STYLE_PRESETS:
+        print(f"❌ Unknown style: {style_name}")
+        print(f"Available styles: {list(STYLE_PRESETS.keys())}")
+        return None
+    
+    weights = STYLE_PRESETS[style_name]
+    print(f"🎛️ Style weights: {weights}")
+    
+    # Load melody if provided (callers training several styles pass it in)
+    if melody_sequence is None:
+        melody_sequence = _load_melody(melody_file)
+    
+    # Training parameters
+    learning_rate = 0.0003
+    batch_size = 64
+    
+    print(f"🚀 Starting training for {episodes} episodes on {num_envs} environment(s)...")
+    
+    if num_envs > 1:
+        # Episodes are independent, so split them across worker processes, each
+        # with its own environment and seed; only the first reports progress
+        from concurrent.futures import ProcessPoolExecutor
+        shares = np.diff(np.linspace(0, episodes, num_envs + 1).astype(int))
+        with ProcessPoolExecutor(max_workers=num_envs) as executor:
+            futures = [
+                executor.submit(_run_style_episodes, weights, melody_sequence, int(share), seed + i, i == 0)
+                for i, share in enumerate(shares)
+            ]
+            reward_history = np.concatenate([future.result() for future in futures])
+    else:
+        reward_history = _run_style_episodes(weights, melody_sequence, episodes, seed)
+    
+    best_reward = float(reward_history.max()) if episodes else -float('inf')
+    
+    return _save_style_model(style_name, weights, reward_history, best_reward, melody_file)
+
+def train_all_styles(episodes_per_style: int = 3000, melody_file: str = None, num_envs: int = 1,
+                     max_workers: int = None, seed: int = 0):
+    """Train models for all available styles, each in its own process"""
     print("🎵 TRAINING ALL STYLE-SPECIFIC MODELS")
     print("=" * 60)
     
-    results = {}
+    # Parse the melody once for all styles
+    melody_sequence = _load_melody(melody_file)
+    
+    # Styles are independent runs writing to their own style_models/<style>/
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers or len(STYLE_PRESETS)) as executor:
+        # Give each style its own block of worker seeds so the styles do not
+        # replay the same random trajectories
+        futures = {
+            style_name: executor.submit(
+                train_style_specific_model, style_name, episodes_per_style, melody_file, num_envs,
+                seed=seed + k * num_envs, melody_sequence=melody_sequence
+            )
+            for k, style_name in enumerate(STYLE_PRESETS.keys())
+        }
+        print(f"\n🎼 Training {len(futures)} styles in parallel...")
+        
+        results = {}
+        for style_name, future in futures.items():
+            result = future.result()
+            if result:
+                results[style_name] = result
+    
+    return _save_comparison(results)
+
+def train_all_styles_fused(episodes_per_style: int = 3000, melody_file: str = None, seed: int = 0):
+    """Train all styles from one shared set of random trajectories
+    
+    The rollouts use random actions and do not depend on the reward weights,
+    so one batch of trajectories is collected and every style scores it.
+    """
+    print("🎵 TRAINING ALL STYLE-SPECIFIC MODELS (shared trajectories)")
+    print("=" * 60)
     
-    for style_name in STYLE_PRESETS.keys():
-        print(f"\n🎼 Training {style_name.upper()} style...")
-        result = train_style_specific_model(style_name, episodes_per_style, melody_file)
-        if result:
-            results[style_name] = result
+    melody_sequence = _load_melody(melody_file)
     
+    # Environment used only to draw the melodies of the episodes
+    env = _make_env({}, melody_sequence, seed)
+    rng = np.random.default_rng(seed)
+    
+    # Random actions and melodies of every episode (0 where there is no melody note)
+    actions = rng.integers(
+        0, env.action_space.nvec, size=(episodes_per_style, env.max_steps, env.num_voices)
+    )
+    melodies = np.zeros((episodes_per_style, env.max_steps), dtype=np.int16)
+    for episode in range(episodes_per_style):
+        env.reset()
+        melody = env.melody_context[:env.max_steps]
+        melodies[episode, :len(melody)] = melody
+    
+    print(f"🚀 Collected {episodes_per_style} episodes, scoring {len(STYLE_PRESETS)} styles...")
+    
+    results = {}
+    for style_name, weights in STYLE_PRESETS.items():
+        print(f"\n🎼 Scoring {style_name.upper()} style...")
+        reward_system = MusicTheoryRewards()
+        reward_system.set_custom_weights(weights)
+        
+        # Score whole episodes at once instead of stepping an environment
+        reward_history = np.array([
+            reward_system.calculate_reward_batch(actions[episode], melodies[episode]).sum()
+            for episode in range(episodes_per_style)
+        ])
+        results[style_name] = _save_style_model(
+            style_name, weights, reward_history, float(reward_history.max()), melody_file
+        )
+    
+    return _save_comparison(results)
+
+def _save_comparison(results: dict):
+    """Save and print the comparison report of the trained styles"""
     # Generate comparison report
     comparison_file = "style_models/style_comparison.json"
     os.makedirs("style_models", exist_ok=True)
     
-    with open(comparison_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    _write_json(comparison_file, results)
     
     print(f"\n🎉 ALL STYLES TRAINED!")
     print(f"📊 Comparison saved to: {comparison_file}")
@@ -247,7 +364,11 @@ if __name__ == "__main__":
     # Train all styles
     # train_all_styles(episodes_per_style=2000, melody_file=melody_file)
     
+    # Train all styles from one shared set of rollouts
+    # train_all_styles_fused(episodes_per_style=2000, melody_file=melody_file)
+    
     print("✅ Style training framework ready!")
     print("🎼 Available styles:", list(STYLE_PRESETS.keys()))
     print("📝 Use train_style_specific_model() to train individual styles")
-    print("🎵 Use train_all_styles() to train all styles at once") 
\ No newline at end of file
+    print("🎵 Use train_all_styles() to train all styles at once")
+    print("⚡ Use train_all_styles_fused() to score all styles from shared rollouts") 
\ No newline at end of file
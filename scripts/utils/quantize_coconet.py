@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Quantize the Coconet checkpoint to an INT8 TF-Lite model.
+
+Calibrates on pianorolls built from the MIDI files in midi_files/ and writes
+best_model.tflite next to the checkpoint, where CoconetWrapper picks it up
+instead of the FP32 graph.
+"""
+
+import glob
+import os
+import sys
+import note_seq
+
+# Add src to path
+sys.path.append('src')
+
+from harmonization.core.coconet_wrapper import CoconetWrapper
+
+def load_representative_features(wrapper, midi_dir="midi_files", max_files=100):
+    """Build calibration pianorolls from a directory of MIDI files"""
+    features = []
+    for midi_path in sorted(glob.glob(os.path.join(midi_dir, "*.mid")))[:max_files]:
+        try:
+            sequence = note_seq.midi_file_to_note_sequence(midi_path)
+        except Exception as e:
+            print(f"⚠️ Skipping {midi_path}: {e}")
+            continue
+        features.append(wrapper.preprocess_sequence(sequence))
+    return features
+
+def main():
+    checkpoint_path = sys.argv[1] if len(sys.argv) > 1 else "coconet-64layers-128filters"
+
+    print(f"🎵 Quantizing Coconet model in {checkpoint_path}")
+    wrapper = CoconetWrapper(checkpoint_path)
+
+    features = load_representative_features(wrapper)
+    if not features:
+        print("❌ No calibration data found in midi_files/")
+        return
+    print(f"📊 Calibrating on {len(features)} pianorolls")
+
+    output_path = wrapper.export_tflite(features)
+    print(f"✅ Quantized model saved to {output_path}")
+
+    wrapper.close()
+
+if __name__ == "__main__":
+    main()
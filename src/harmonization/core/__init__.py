@@ -3,6 +3,7 @@ Core components for RL harmonization system.
 """
 
 from .coconet_wrapper import CoconetWrapper
+from .coconet_queue import CoconetInferenceQueue
 from .rl_environment import HarmonizationEnvironment
 
-__all__ = ["CoconetWrapper", "HarmonizationEnvironment"] 
\ No newline at end of file
+__all__ = ["CoconetWrapper", "CoconetInferenceQueue", "HarmonizationEnvironment"] 
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+Numba kernel for the reward-only environment step.
+
+Fuses note bookkeeping, the observation update and the simplified reward of
+HarmonizationEnvironment.step into one compiled call. Without Numba ``njit``
+is a no-op and ``NUMBA_AVAILABLE`` is False, in which case the environment
+keeps using its NumPy step.
+"""
+
+from ..rewards._rewards_numba import NUMBA_AVAILABLE, njit, calc_reward_core
+
+@njit(cache=True, error_model='numpy')
+def fast_step(pitches, starts, ends, voices, n, action, step, melody_pitch, obs,
+              weights, consonant_mask, dissonant_mask, major_mask, note_duration, min_pitch):
+    """
+    Record the notes of one step, update the observation and score the step.
+
+    Args:
+        pitches: MIDI pitch array of the episode (written in place)
+        starts: Start time array of the episode (written in place)
+        ends: End time array of the episode (written in place)
+        voices: Voice index array of the episode (written in place)
+        n: Number of notes recorded before this step
+        action: Pitch indices chosen for each voice
+        step: Current step index
+        melody_pitch: Current melody pitch, 0 when there is none
+        obs: Observation buffer of shape (max_steps, 88, channels) (written in place)
+        weights: Rule weights in RULE_ORDER
+        consonant_mask: 12-bit mask of consonant interval classes
+        dissonant_mask: 12-bit mask of dissonant interval classes
+        major_mask: 12-bit mask of major scale pitch classes
+        note_duration: Duration of one step
+        min_pitch: MIDI pitch of action index 0
+
+    Returns:
+        Reward for the step
+    """
+    num_voices = action.shape[0]
+    start_time = step * note_duration
+
+    for v in range(num_voices):
+        pitches[n + v] = action[v] + min_pitch
+        starts[n + v] = start_time
+        ends[n + v] = start_time + note_duration
+        voices[n + v] = v
+
+    if 0 <= step < obs.shape[0]:
+        for v in range(num_voices):
+            if 0 <= action[v] < 88:
+                obs[step, action[v], v] = 1.0
+
+    return calc_reward_core(pitches, voices, n + num_voices, action, melody_pitch,
+                            weights, consonant_mask, dissonant_mask, major_mask)
@@ -0,0 +1,155 @@
+"""
+Request queue that batches Coconet forward passes.
+
+Gibbs sampling runs many small forward passes. CoconetInferenceQueue lets
+callers on several threads submit single pianorolls and coalesces pending
+requests into one batched call to the wrapper, spreading the fixed launch
+overhead of a forward pass across the batch.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import numpy as np
+
+# Marks the end of the request stream for the worker thread
+_STOP = object()
+
+class CoconetInferenceQueue:
+    """
+    Coalesce single-pianoroll Coconet requests into batched forward passes.
+    
+    A background thread waits for the first pending request, collects up to
+    ``max_batch`` requests that arrive within ``max_wait`` seconds, runs them
+    as one batch and resolves each request's future with its slice of the
+    output. Batches are padded to ``max_batch`` so the model always sees the
+    same input shape (the TF-Lite interpreter re-plans its buffers whenever
+    the batch size changes). The wrapper serializes its own inference calls,
+    so it can still be used directly from other threads.
+    """
+    
+    def __init__(self, wrapper, max_batch: int = 8, max_wait: float = 0.002):
+        """
+        Initialize the queue and start the worker thread.
+        
+        Args:
+            wrapper: CoconetWrapper used for inference
+            max_batch: Largest number of requests run in one forward pass
+            max_wait: Seconds to wait for more requests before running a
+                partial batch
+        """
+        self.wrapper = wrapper
+        self.max_batch = min(max_batch, wrapper.MAX_BATCH)
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._closed = False
+        # Makes the closed check and the enqueue in submit() atomic with close()
+        self._state_lock = threading.Lock()
+        # Fixed-size input batch, allocated on the first request
+        self._batch = None
+        self._worker = threading.Thread(target=self._serve, name="coconet-inference", daemon=True)
+        self._worker.start()
+    
+    def submit(self, features: np.ndarray) -> Future:
+        """
+        Queue one pianoroll for inference.
+        
+        Args:
+            features: Input features of shape (32, 88, 4), i.e. the
+                pianoroll and mask channels of a single Gibbs step
+        
+        Returns:
+            Future resolving to the model output for this pianoroll
+        """
+        future = Future()
+        with self._state_lock:
+            if self._closed:
+                raise RuntimeError("CoconetInferenceQueue is closed")
+            self._requests.put((np.asarray(features, dtype=np.float32), future))
+        return future
+    
+    def _next_batch(self) -> Tuple[List[Tuple[np.ndarray, Future]], bool]:
+        """
+        Block for the next batch of requests.
+        
+        Returns:
+            Tuple of (requests, stopped); stopped is True once close() was called
+        """
+        first = self._requests.get()
+        if first is _STOP:
+            return [], True
+        
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                request = self._requests.get(timeout=self.max_wait)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+    
+    def _serve(self):
+        """Worker loop: run queued requests in batches until closed."""
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if not batch:
+                continue
+            
+            try:
+                output = self.wrapper._run_inference(self._fill_batch(batch))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            # Scatter the batched output back to the individual requests,
+            # copying so results do not keep the padded output alive
+            for i, (_, future) in enumerate(batch):
+                future.set_result(output[i].copy())
+        
+        # Nothing can be queued after close(), but never leave a caller waiting
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not _STOP:
+                request[1].set_exception(RuntimeError("CoconetInferenceQueue is closed"))
+    
+    def _fill_batch(self, batch: List[Tuple[np.ndarray, Future]]) -> np.ndarray:
+        """
+        Copy the requests into the fixed-size input batch.
+        
+        Args:
+            batch: Pending (features, future) requests
+        
+        Returns:
+            Input batch of shape (max_batch, ...); rows past the requests are padding
+        """
+        shape = batch[0][0].shape
+        if self._batch is None or self._batch.shape[1:] != shape:
+            self._batch = np.zeros((self.max_batch,) + shape, dtype=np.float32)
+        
+        for i, (features, _) in enumerate(batch):
+            self._batch[i] = features
+        return self._batch
+    
+    def close(self):
+        """Finish the queued requests and stop the worker thread."""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._requests.put(_STOP)
+        self._worker.join()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -5,13 +5,18 @@ This module provides a wrapper around the pre-trained Coconet model
 to integrate it with the RL environment.
 """
 
+import functools
+import hashlib
 import os
+import threading
 import numpy as np
 import tensorflow as tf
 from typing import Optional, Tuple, List, Dict, Any
 import note_seq
 from note_seq import NoteSequence, constants
 
+from ._sampling_numba import NUMBA_AVAILABLE, sample_pitches as _sample_pitches_numba
+
 class CoconetWrapper:
     """
     Wrapper for the pre-trained Coconet model.
@@ -22,22 +27,45 @@ class CoconetWrapper:
     - Convert between NoteSequence and model input formats
     """
     
-    def __init__(self, checkpoint_path: str = "../coconet-64layers-128filters"):
+    # Largest batch served from the persistent on-device input buffer
+    MAX_BATCH = 64
+    
+    def __init__(self,
+                 checkpoint_path: str = "../coconet-64layers-128filters",
+                 feature_cache_dir: Optional[str] = None):
         """
         Initialize the Coconet wrapper.
         
         Args:
             checkpoint_path: Path to the Coconet checkpoint directory
+            feature_cache_dir: Optional directory for persisting preprocessed
+                features across runs
         """
         self.checkpoint_path = checkpoint_path
+        self.feature_cache_dir = feature_cache_dir
+        # Per-instance LRU cache of preprocessed features, keyed by the
+        # serialized input sequence
+        self._preprocess_cached = functools.lru_cache(maxsize=1024)(self._preprocess_serialized)
         self.model = None
         self.session = None
         self.graph = None
+        self._infer = None
+        self._input_var = None
+        self._interpreter = None
+        # Serializes use of the shared input buffer and TF-Lite interpreter,
+        # which callers on different threads (e.g. CoconetInferenceQueue) share
+        self._inference_lock = threading.Lock()
         self._load_model()
         
     def _load_model(self):
         """Load the pre-trained Coconet model."""
         try:
+            # Prefer a quantized TF-Lite export next to the checkpoint
+            tflite_path = os.path.join(self.checkpoint_path, "best_model.tflite")
+            if os.path.exists(tflite_path):
+                self._load_tflite_model(tflite_path)
+                return
+            
             # Load the model graph
             meta_path = os.path.join(self.checkpoint_path, "best_model.ckpt.meta")
             if not os.path.exists(meta_path):
@@ -46,13 +74,16 @@ class CoconetWrapper:
             # Create new graph and session
             self.graph = tf.Graph()
             with self.graph.as_default():
-                # Import the meta graph
-                saver = tf.train.import_meta_graph(meta_path)
+                # Import the meta graph. The checkpoint is restored through the
+                # explicit tf.compat.v1 graph APIs, which run in graph mode even
+                # with eager execution on; eager stays enabled because inference
+                # goes through the ConcreteFunction below.
+                saver = tf.compat.v1.train.import_meta_graph(meta_path)
                 
                 # Create session
-                config = tf.ConfigProto()
+                config = tf.compat.v1.ConfigProto()
                 config.gpu_options.allow_growth = True
-                self.session = tf.Session(config=config)
+                self.session = tf.compat.v1.Session(config=config)
                 
                 # Restore the model
                 checkpoint_path = os.path.join(self.checkpoint_path, "best_model.ckpt")
@@ -62,16 +93,244 @@ class CoconetWrapper:
                 self.input_tensor = self.graph.get_tensor_by_name("input_tensor:0")
                 self.output_tensor = self.graph.get_tensor_by_name("output_tensor:0")
                 
-                print(f"✅ Coconet model loaded successfully from {self.checkpoint_path}")
+                # Freeze the restored variables into constants
+                frozen_graph_def = tf.compat.v1.graph_util.convert_variables_to_constants(
+                    self.session, self.graph.as_graph_def(), ["output_tensor"]
+                )
+            
+            # Wrap the frozen graph as a ConcreteFunction so inference skips
+            # feed_dict marshaling and per-call session dispatch. The graph and
+            # a persistent input buffer live on the GPU when one is available,
+            # so steady-state calls reuse the same device memory.
+            device = '/GPU:0' if tf.config.list_physical_devices('GPU') else '/CPU:0'
+            with tf.device(device):
+                self._infer = self._wrap_frozen_graph(
+                    frozen_graph_def, "input_tensor:0", "output_tensor:0"
+                )
+                self._input_var = tf.Variable(
+                    tf.zeros((self.MAX_BATCH, 32, 88, 4)), trainable=False
+                )
+            
+            print(f"✅ Coconet model loaded successfully from {self.checkpoint_path}")
                 
         except Exception as e:
             print(f"❌ Error loading Coconet model: {e}")
             raise
     
+    def _load_tflite_model(self, tflite_path: str):
+        """
+        Load a quantized TF-Lite export of the Coconet model.
+        
+        Args:
+            tflite_path: Path to the .tflite file
+        """
+        self._interpreter = tf.lite.Interpreter(model_path=tflite_path)
+        self._interpreter.allocate_tensors()
+        self._tflite_input = self._interpreter.get_input_details()[0]
+        self._tflite_output = self._interpreter.get_output_details()[0]
+        
+        print(f"✅ Quantized Coconet model loaded successfully from {tflite_path}")
+    
+    def export_tflite(self,
+                      representative_features: List[np.ndarray],
+                      output_path: Optional[str] = None) -> str:
+        """
+        Convert the loaded model to an INT8-quantized TF-Lite file.
+        
+        The weights and activations are quantized to INT8, calibrated on the
+        given features. Inputs and outputs stay float32, so the quantized
+        model is a drop-in replacement; save it as ``best_model.tflite`` in
+        the checkpoint directory and it is picked up on the next load.
+        
+        Args:
+            representative_features: Calibration inputs, each of shape (32, 88, 4)
+            output_path: Where to write the model (defaults to the checkpoint directory)
+            
+        Returns:
+            Path of the written .tflite file
+        """
+        if self.session is None:
+            raise RuntimeError("export_tflite requires the FP32 checkpoint to be loaded")
+        
+        def representative_dataset():
+            for features in representative_features:
+                yield [np.asarray(features, dtype=np.float32)[np.newaxis]]
+        
+        converter = tf.compat.v1.lite.TFLiteConverter.from_session(
+            self.session, [self.input_tensor], [self.output_tensor]
+        )
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.representative_dataset = representative_dataset
+        tflite_model = converter.convert()
+        
+        if output_path is None:
+            output_path = os.path.join(self.checkpoint_path, "best_model.tflite")
+        with open(output_path, 'wb') as f:
+            f.write(tflite_model)
+        
+        return output_path
+    
+    @staticmethod
+    def _wrap_frozen_graph(graph_def, input_name: str, output_name: str):
+        """
+        Wrap a frozen GraphDef as a ConcreteFunction.
+        
+        Args:
+            graph_def: Frozen GraphDef (variables converted to constants)
+            input_name: Name of the input tensor
+            output_name: Name of the output tensor
+            
+        Returns:
+            ConcreteFunction mapping a (batch, 32, 88, 4) float32 tensor to the model output
+        """
+        def _import_graph_def():
+            tf.compat.v1.import_graph_def(graph_def, name="")
+        
+        wrapped = tf.compat.v1.wrap_function(_import_graph_def, [])
+        imported = wrapped.graph
+        return wrapped.prune(
+            imported.as_graph_element(input_name),
+            imported.as_graph_element(output_name)
+        )
+    
+    def _run_inference(self, features: np.ndarray) -> np.ndarray:
+        """
+        Run the frozen Coconet graph.
+        
+        Args:
+            features: Batched input features of shape (batch, 32, 88, 4)
+            
+        Returns:
+            Model output as a numpy array
+        """
+        with self._inference_lock:
+            if self._interpreter is not None:
+                return self._run_tflite(features)
+            return self._infer(self._input_tensor(features)).numpy()
+    
+    def _input_tensor(self, features: np.ndarray) -> tf.Tensor:
+        """
+        Move batched input features onto the inference device.
+        
+        Writes the shared input buffer, so callers must hold _inference_lock.
+        
+        Args:
+            features: Batched input features of shape (batch, 32, 88, 4)
+            
+        Returns:
+            Input tensor for the frozen graph
+        """
+        batch_size = features.shape[0]
+        if batch_size > self.MAX_BATCH:
+            return tf.constant(features, dtype=tf.float32)
+        
+        # Copy into the persistent input buffer instead of allocating a new tensor
+        self._input_var[:batch_size].assign(features.astype(np.float32, copy=False))
+        return self._input_var[:batch_size]
+    
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, 32, 88, 4], tf.float32),
+        tf.TensorSpec([None], tf.int64),
+        tf.TensorSpec([None], tf.int64)
+    ])
+    def _action_probabilities_graph(self, features, pitch_idx, voice_idx):
+        """
+        Run the model and gather normalized action probabilities on-device.
+        
+        Args:
+            features: Batched input features of shape (batch, 32, 88, 4)
+            pitch_idx: Output pitch index of each action
+            voice_idx: Output voice index of each action
+            
+        Returns:
+            Tensor of shape (batch, num_actions), one distribution per state
+        """
+        output = self._infer(features)
+        
+        # (pitch, voice, batch) layout so gather_nd picks one column per action
+        per_action = tf.gather_nd(
+            tf.transpose(output, [1, 2, 0]), tf.stack([pitch_idx, voice_idx], axis=1)
+        )
+        probs = tf.transpose(per_action)
+        
+        # Normalize, falling back to uniform for states with no probability mass
+        totals = tf.reduce_sum(probs, axis=1, keepdims=True)
+        uniform = tf.fill(tf.shape(probs), 1.0 / tf.cast(tf.shape(probs)[1], probs.dtype))
+        return tf.where(totals > 0, tf.math.divide_no_nan(probs, totals), uniform)
+    
+    def _run_tflite(self, features: np.ndarray) -> np.ndarray:
+        """
+        Run the quantized TF-Lite model.
+        
+        Uses the shared interpreter, so callers must hold _inference_lock.
+        
+        Args:
+            features: Batched input features of shape (batch, 32, 88, 4)
+            
+        Returns:
+            Model output as a numpy array
+        """
+        input_index = self._tflite_input['index']
+        if tuple(self._tflite_input['shape']) != features.shape:
+            # Batch size changed: resize the input and re-plan the buffers
+            self._interpreter.resize_tensor_input(input_index, features.shape)
+            self._interpreter.allocate_tensors()
+            self._tflite_input = self._interpreter.get_input_details()[0]
+            self._tflite_output = self._interpreter.get_output_details()[0]
+        
+        self._interpreter.set_tensor(input_index, features.astype(np.float32, copy=False))
+        self._interpreter.invoke()
+        return self._interpreter.get_tensor(self._tflite_output['index'])
+    
     def preprocess_sequence(self, note_sequence: NoteSequence) -> np.ndarray:
         """
         Preprocess a NoteSequence into the format expected by Coconet.
         
+        Results are cached, since the same melody is usually harmonized many
+        times during training. The returned array is shared with the cache
+        and is read-only.
+        
+        Args:
+            note_sequence: Input NoteSequence
+            
+        Returns:
+            Preprocessed numpy array
+        """
+        return self._preprocess_cached(note_sequence.SerializeToString(deterministic=True))
+    
+    def _preprocess_serialized(self, serialized: bytes) -> np.ndarray:
+        """
+        Preprocess a serialized NoteSequence, using the on-disk cache if enabled.
+        
+        Args:
+            serialized: Serialized NoteSequence
+            
+        Returns:
+            Read-only preprocessed numpy array
+        """
+        cache_path = None
+        if self.feature_cache_dir:
+            digest = hashlib.sha1(serialized).hexdigest()
+            cache_path = os.path.join(self.feature_cache_dir, f"{digest}.npy")
+            if os.path.exists(cache_path):
+                features = np.load(cache_path)
+                features.flags.writeable = False
+                return features
+        
+        features = self._preprocess(NoteSequence.FromString(serialized))
+        
+        if cache_path:
+            os.makedirs(self.feature_cache_dir, exist_ok=True)
+            np.save(cache_path, features)
+        
+        features.flags.writeable = False
+        return features
+    
+    def _preprocess(self, note_sequence: NoteSequence) -> np.ndarray:
+        """
+        Run the (uncached) preprocessing pipeline on a NoteSequence.
+        
         Args:
             note_sequence: Input NoteSequence
             
@@ -108,13 +367,18 @@ class CoconetWrapper:
         # This is a simplified version - actual Coconet uses more complex features
         features = np.zeros((32, 88, 4))  # 32 time steps, 88 pitches, 4 voices
         
-        for note in pianoroll.notes:
-            time_step = int(note.start_time * 4)  # 16th note quantization
-            pitch_idx = note.pitch - 21  # MIDI pitch 21 (A0) to 108 (C8)
-            voice_idx = note.instrument % 4  # Map to 4 voices
-            
-            if 0 <= time_step < 32 and 0 <= pitch_idx < 88:
-                features[time_step, pitch_idx, voice_idx] = 1.0
+        # Read the note fields in one pass into a columnar record array
+        notes = np.array(
+            [(note.start_time, note.pitch, note.instrument) for note in pianoroll.notes],
+            dtype=[('start_time', np.float64), ('pitch', np.int32), ('instrument', np.int32)]
+        )
+        time_steps = (notes['start_time'] * 4).astype(np.int64)  # 16th note quantization
+        pitch_idx = notes['pitch'] - 21  # MIDI pitch 21 (A0) to 108 (C8)
+        voice_idx = notes['instrument'] % 4  # Map to 4 voices
+        
+        # Drop notes outside the 32-step, 88-pitch grid with one mask
+        valid = (time_steps >= 0) & (time_steps < 32) & (pitch_idx >= 0) & (pitch_idx < 88)
+        features[time_steps[valid], pitch_idx[valid], voice_idx[valid]] = 1.0
         
         return features
     
@@ -136,21 +400,16 @@ class CoconetWrapper:
         # Preprocess input
         features = self.preprocess_sequence(primer_sequence)
         
-        # Generate completion
-        with self.graph.as_default():
-            # Run inference
-            output = self.session.run(
-                self.output_tensor,
-                feed_dict={self.input_tensor: features}
-            )
-            
-            # Apply temperature
-            if temperature != 1.0:
-                output = output / temperature
-            
-            # Sample from output distribution
-            completion = self._sample_from_output(output, num_steps)
-            
+        # Run inference
+        output = self._run_inference(features[np.newaxis])[0]
+        
+        # Apply temperature
+        if temperature != 1.0:
+            output = output / temperature
+        
+        # Sample from output distribution
+        completion = self._sample_from_output(output, num_steps)
+        
         return completion
     
     def _sample_from_output(self, output: np.ndarray, num_steps: int) -> NoteSequence:
@@ -170,16 +429,23 @@ class CoconetWrapper:
         sequence = NoteSequence()
         sequence.ticks_per_quarter = 220
         
-        # Simple sampling strategy
+        # Simple sampling strategy: invert each (step, voice) pitch CDF with one
+        # uniform draw, all positions at once
+        uniforms = np.random.rand(num_steps, 4)
+        if NUMBA_AVAILABLE:
+            # Fused pass: normalize, accumulate and search without materializing the CDF
+            pitch_idx = _sample_pitches_numba(np.ascontiguousarray(output[:num_steps]), uniforms)
+        else:
+            cdf = np.cumsum(output[:num_steps], axis=1)
+            cdf /= cdf[:, -1:, :]
+            pitch_idx = (cdf > uniforms[:, np.newaxis, :]).argmax(axis=1)
+        pitches = (pitch_idx + 21).tolist()  # Add MIDI offset
+        
         for step in range(num_steps):
             for voice in range(4):
-                # Sample a pitch for each voice
-                pitch_probs = output[step, :, voice]
-                pitch = np.random.choice(88, p=pitch_probs) + 21  # Add MIDI offset
-                
                 # Create note
                 note = sequence.notes.add()
-                note.pitch = pitch
+                note.pitch = pitches[step][voice]
                 note.start_time = step * 0.25  # 16th notes
                 note.end_time = (step + 1) * 0.25
                 note.velocity = 80
@@ -200,31 +466,46 @@ class CoconetWrapper:
         Returns:
             Probability distribution over actions
         """
-        # Convert state to model input format
-        features = self._state_to_features(state)
+        return self.get_action_probabilities_batch(state[np.newaxis], action_space)[0]
+    
+    def get_action_probabilities_batch(self,
+                                     states: np.ndarray,
+                                     action_space: List[int]) -> np.ndarray:
+        """
+        Get action probability distributions for a batch of states.
         
-        # Get model output
-        with self.graph.as_default():
-            output = self.session.run(
-                self.output_tensor,
-                feed_dict={self.input_tensor: features}
-            )
+        Runs a single forward pass for all states, e.g. the stacked
+        observations of a vectorized environment.
+        
+        Args:
+            states: Batch of state representations (one per environment)
+            action_space: List of possible action indices
+            
+        Returns:
+            Array of shape (len(states), len(action_space)), one distribution per state
+        """
+        # Convert states to model input format
+        features = np.concatenate([self._state_to_features(state) for state in states])
         
         # Extract probabilities for the action space
         # This is a simplified version - would need proper action mapping
-        probs = np.zeros(len(action_space))
-        for i, action in enumerate(action_space):
-            # Map action to model output indices
-            # This mapping would depend on how actions are defined
-            probs[i] = output[0, action % 88, action // 88]
-        
-        # Normalize
-        if probs.sum() > 0:
-            probs = probs / probs.sum()
-        else:
-            probs = np.ones(len(action_space)) / len(action_space)
+        actions = np.asarray(action_space, dtype=np.int64)
+        
+        if self._interpreter is None:
+            # Gather and normalize in the graph so only the probabilities leave the device
+            with self._inference_lock:
+                return self._action_probabilities_graph(
+                    self._input_tensor(features), actions % 88, actions // 88
+                ).numpy()
+        
+        # Get model output for the whole batch
+        output = self._run_inference(features)
+        probs = output[:, actions % 88, actions // 88]
         
-        return probs
+        # Normalize, falling back to uniform for states with no probability mass
+        totals = probs.sum(axis=1, keepdims=True)
+        uniform = np.full(probs.shape, 1.0 / len(action_space))
+        return np.where(totals > 0, probs / np.where(totals > 0, totals, 1.0), uniform)
     
     def _state_to_features(self, state: np.ndarray) -> np.ndarray:
         """
@@ -12,6 +12,7 @@ import mido
 from mido import MidiFile, Message, MidiTrack
 
 from ..rewards.music_theory_rewards import MusicTheoryRewards
+from ._env_numba import NUMBA_AVAILABLE, fast_step as _fast_step_numba
 
 class HarmonizationEnvironment(gym.Env):
     """
@@ -26,7 +27,8 @@ class HarmonizationEnvironment(gym.Env):
                  reward_system: Optional[MusicTheoryRewards] = None,
                  max_steps: int = 32,
                  num_voices: int = 4,
-                 melody_sequence: Optional[list] = None):
+                 melody_sequence: Optional[list] = None,
+                 seed: Optional[int] = None):
         """
         Initialize the harmonization environment.
         
@@ -36,6 +38,8 @@ class HarmonizationEnvironment(gym.Env):
             max_steps: Maximum number of steps per episode
             num_voices: Number of voices in the harmonization
             melody_sequence: Optional melody sequence to harmonize
+            seed: Optional seed for the environment's own random generator;
+                without it random melodies come from the global NumPy RNG
         """
         super().__init__()
         
@@ -59,8 +63,8 @@ class HarmonizationEnvironment(gym.Env):
         
         # Environment state
         self.current_step = 0
-        self.current_sequence = []
-        self.episode_rewards = []
+        self._reset_notes()
+        self._reset_rewards()
         self.melody_context = []
         
         # Musical constants
@@ -68,6 +72,19 @@ class HarmonizationEnvironment(gym.Env):
         self.MIDI_MAX_PITCH = 108  # C8
         self.NOTE_DURATION = 0.25  # 16th note duration
         
+        # C major scale pitches (C4 to C5) for random melodies
+        self._scale = np.array([60, 62, 64, 65, 67, 69, 71, 72], dtype=np.int32)
+        
+        # Random source for melodies; np.random keeps the unseeded behaviour
+        self._rng = np.random.default_rng(seed) if seed is not None else np.random
+        
+        # Persistent observation buffer, updated in place as notes are added
+        self._reset_observation()
+        
+        if NUMBA_AVAILABLE:
+            # Compile (or load from cache) now rather than on the first step
+            self._warm_up_fast_step()
+        
     def reset(self) -> np.ndarray:
         """
         Reset the environment for a new episode.
@@ -76,8 +93,8 @@ class HarmonizationEnvironment(gym.Env):
             Initial observation
         """
         self.current_step = 0
-        self.current_sequence = []
-        self.episode_rewards = []
+        self._reset_notes()
+        self._reset_rewards()
         
         # Initialize melody context if provided
         if self.melody_sequence:
@@ -86,6 +103,8 @@ class HarmonizationEnvironment(gym.Env):
             # Generate random melody context
             self.melody_context = self._generate_random_melody()
         
+        self._reset_observation()
+        
         # Return initial observation
         return self._get_observation()
     
@@ -99,22 +118,29 @@ class HarmonizationEnvironment(gym.Env):
         Returns:
             (observation, reward, done, info)
         """
-        # Convert action to notes
-        new_notes = self._action_to_notes(action)
+        melody_note = self.melody_context[self.current_step] if self.current_step < len(self.melody_context) else None
         
-        # Add new notes to sequence
-        self.current_sequence.extend(new_notes)
-        
-        # Calculate reward
-        reward = self.reward_system.calculate_reward_simple(
-            self.current_sequence, 
-            action, 
-            self.melody_context[self.current_step] if self.current_step < len(self.melody_context) else None
-        )
+        if self._can_fast_step(action):
+            reward = self._fast_step(action, melody_note)
+        else:
+            # Convert action to notes
+            pitches, starts, ends, voices = self._action_to_notes(action)
+            
+            # Add new notes to sequence
+            self._append_notes(pitches, starts, ends, voices)
+            self._add_notes_to_observation(action)
+            
+            # Calculate reward
+            reward = self.reward_system.calculate_reward_simple(
+                self._pitches[:self._num_notes],
+                self._voices[:self._num_notes],
+                action, 
+                melody_note
+            )
         
         # Update state
+        self._record_reward(reward)
         self.current_step += 1
-        self.episode_rewards.append(reward)
         
         # Check if episode is done
         done = self.current_step >= self.max_steps
@@ -125,91 +151,217 @@ class HarmonizationEnvironment(gym.Env):
         # Additional info
         info = {
             'step': self.current_step,
-            'total_reward': sum(self.episode_rewards),
-            'average_reward': np.mean(self.episode_rewards) if self.episode_rewards else 0.0,
+            'total_reward': self._reward_sum,
+            'average_reward': self._reward_sum / self.current_step,
             'melody_note': self.melody_context[self.current_step - 1] if self.current_step > 0 else None
         }
         
         return observation, reward, done, info
     
-    def _action_to_notes(self, action: np.ndarray) -> list:
+    def _can_fast_step(self, action: np.ndarray) -> bool:
         """
-        Convert action array to list of note dictionaries.
+        Check whether this step can run as a single compiled call.
+        
+        The compiled step covers the built-in reward rules only, so subclassed
+        reward systems go through the regular path. It also needs room for the
+        new notes in the note arrays.
         
         Args:
             action: Array of pitch selections for each voice
             
         Returns:
-            List of note dictionaries
+            True if the compiled step applies
+        """
+        return (NUMBA_AVAILABLE
+                and type(self.reward_system) is MusicTheoryRewards
+                and len(action) == self.num_voices
+                and self._num_notes + len(action) <= len(self._pitches))
+    
+    def _fast_step(self, action: np.ndarray, melody_note: Optional[int]) -> float:
         """
-        notes = []
-        current_time = self.current_step * self.NOTE_DURATION
+        Record the notes, update the observation and compute the reward in one compiled call.
         
-        for voice_idx, pitch_idx in enumerate(action):
-            # Convert pitch index to MIDI pitch
-            midi_pitch = pitch_idx + self.MIDI_MIN_PITCH
+        Args:
+            action: Array of pitch selections for each voice
+            melody_note: Current melody note (optional)
             
-            # Create note dictionary
-            note = {
-                'pitch': midi_pitch,
-                'start_time': current_time,
-                'end_time': current_time + self.NOTE_DURATION,
-                'velocity': 80,
-                'voice': voice_idx
-            }
-            notes.append(note)
+        Returns:
+            Reward for the step
+        """
+        reward = _fast_step_numba(
+            self._pitches, self._starts, self._ends, self._voices, self._num_notes,
+            np.asarray(action, dtype=np.int64), self.current_step,
+            int(melody_note) if melody_note else 0, self._obs,
+            *self.reward_system.kernel_arguments(),
+            self.NOTE_DURATION, self.MIDI_MIN_PITCH
+        )
+        self._num_notes += len(action)
+        return reward
+    
+    def _warm_up_fast_step(self):
+        """
+        Run the compiled step once on scratch buffers of the episode dtypes.
+        """
+        _fast_step_numba(
+            np.empty(self.num_voices, dtype=np.int16), np.empty(self.num_voices, dtype=np.float32),
+            np.empty(self.num_voices, dtype=np.float32), np.empty(self.num_voices, dtype=np.int16), 0,
+            np.zeros(self.num_voices, dtype=np.int64), 0, 0, np.zeros_like(self._obs),
+            *self.reward_system.kernel_arguments(),
+            self.NOTE_DURATION, self.MIDI_MIN_PITCH
+        )
+    
+    @property
+    def episode_rewards(self) -> np.ndarray:
+        """
+        Rewards received so far in the episode.
         
-        return notes
+        Returns:
+            View of the reward buffer, one entry per step
+        """
+        return self._rewards[:self.current_step]
+    
+    def _reset_rewards(self):
+        """
+        Allocate an empty reward buffer and reset the running total.
+        """
+        self._rewards = np.empty(self.max_steps, dtype=np.float64)
+        self._reward_sum = 0.0
+    
+    def _record_reward(self, reward: float):
+        """
+        Store the reward of the current step and update the running total.
+        
+        Args:
+            reward: Reward for the current step
+        """
+        if self.current_step >= len(self._rewards):
+            # Only reached when stepping past max_steps
+            self._rewards = np.concatenate([self._rewards, np.empty(len(self._rewards) + 1)])
+        
+        self._rewards[self.current_step] = reward
+        self._reward_sum += reward
+    
+    def _reset_notes(self):
+        """
+        Allocate empty note arrays for a new episode.
+        
+        Notes are stored as parallel arrays (pitches, start times, end times,
+        voices); the first ``_num_notes`` entries of each are filled.
+        """
+        capacity = self.max_steps * self.num_voices
+        self._pitches = np.empty(capacity, dtype=np.int16)
+        self._starts = np.empty(capacity, dtype=np.float32)
+        self._ends = np.empty(capacity, dtype=np.float32)
+        self._voices = np.empty(capacity, dtype=np.int16)
+        self._num_notes = 0
+    
+    def _append_notes(self, pitches: np.ndarray, starts: np.ndarray,
+                      ends: np.ndarray, voices: np.ndarray):
+        """
+        Copy notes into the note arrays.
+        
+        Args:
+            pitches: MIDI pitches
+            starts: Start times
+            ends: End times
+            voices: Voice indices
+        """
+        end = self._num_notes + len(pitches)
+        if end > len(self._pitches):
+            # Only reached when stepping past max_steps or with extra voices
+            self._pitches = np.concatenate([self._pitches, np.empty(end, dtype=np.int16)])
+            self._starts = np.concatenate([self._starts, np.empty(end, dtype=np.float32)])
+            self._ends = np.concatenate([self._ends, np.empty(end, dtype=np.float32)])
+            self._voices = np.concatenate([self._voices, np.empty(end, dtype=np.int16)])
+        
+        self._pitches[self._num_notes:end] = pitches
+        self._starts[self._num_notes:end] = starts
+        self._ends[self._num_notes:end] = ends
+        self._voices[self._num_notes:end] = voices
+        self._num_notes = end
+    
+    def _action_to_notes(self, action: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Convert action array to notes.
+        
+        Args:
+            action: Array of pitch selections for each voice
+            
+        Returns:
+            (pitches, starts, ends, voices) arrays with one entry per voice
+        """
+        num_voices = len(action)
+        
+        # Convert pitch indices to MIDI pitches
+        pitches = np.asarray(action).astype(np.int16) + np.int16(self.MIDI_MIN_PITCH)
+        starts = np.full(num_voices, self.current_step * self.NOTE_DURATION, dtype=np.float32)
+        ends = starts + np.float32(self.NOTE_DURATION)
+        voices = np.arange(num_voices, dtype=np.int16)
+        
+        return pitches, starts, ends, voices
     
     def _get_observation(self) -> np.ndarray:
         """
         Get current observation.
         
+        The observation buffer is updated in place as the episode advances,
+        so callers get a copy that stays valid across later steps (agents
+        keep the previous state for their updates).
+        
         Returns:
             Observation array
         """
-        # Create observation array
-        obs = np.zeros((self.max_steps, 88, self.num_voices + 2), dtype=np.float32)
-        
-        # Fill in current sequence data
-        for note in self.current_sequence:
-            time_step = int(note['start_time'] / self.NOTE_DURATION)
-            pitch_idx = note['pitch'] - self.MIDI_MIN_PITCH
-            voice_idx = note['voice']
-            
-            if 0 <= time_step < self.max_steps and 0 <= pitch_idx < 88:
-                obs[time_step, pitch_idx, voice_idx] = 1.0
+        return self._obs.copy()
+    
+    def _reset_observation(self):
+        """
+        Allocate the observation buffer and fill the episode-constant channels.
+        """
+        self._obs = np.zeros((self.max_steps, 88, self.num_voices + 2), dtype=np.float32)
         
         # Fill in melody context
-        for step in range(min(len(self.melody_context), self.max_steps)):
-            if self.melody_context[step] is not None:
-                melody_pitch = self.melody_context[step]
-                pitch_idx = melody_pitch - self.MIDI_MIN_PITCH
-                if 0 <= pitch_idx < 88:
-                    obs[step, pitch_idx, self.num_voices] = 1.0
+        self._fill_melody_observation()
         
         # Add additional features
-        for step in range(self.max_steps):
-            obs[step, :, self.num_voices + 1] = step / self.max_steps  # Normalized step
+        self._obs[:, :, self.num_voices + 1] = (np.arange(self.max_steps) / self.max_steps)[:, np.newaxis]  # Normalized step
+    
+    def _fill_melody_observation(self):
+        """
+        Write the melody context into the melody channel of the observation.
+        """
+        self._obs[:, :, self.num_voices] = 0.0
+        
+        melody = [(step, pitch - self.MIDI_MIN_PITCH)
+                  for step, pitch in enumerate(self.melody_context[:self.max_steps])
+                  if pitch is not None]
+        if melody:
+            steps, pitch_idx = np.array(melody).T
+            valid = (pitch_idx >= 0) & (pitch_idx < 88)
+            self._obs[steps[valid], pitch_idx[valid], self.num_voices] = 1.0
+    
+    def _add_notes_to_observation(self, action: np.ndarray):
+        """
+        Scatter the notes of the current step into the observation.
+        
+        Args:
+            action: Array of pitch selections for each voice
+        """
+        if not 0 <= self.current_step < self.max_steps:
+            return
         
-        return obs
+        pitch_idx = np.asarray(action)
+        voice_idx = np.arange(len(pitch_idx))
+        valid = (pitch_idx >= 0) & (pitch_idx < 88)
+        self._obs[self.current_step, pitch_idx[valid], voice_idx[valid]] = 1.0
     
-    def _generate_random_melody(self) -> list:
+    def _generate_random_melody(self) -> np.ndarray:
         """
         Generate a random melody for training.
         
         Returns:
-            List of MIDI pitches
+            Array of MIDI pitches
         """
-        melody = []
-        # C major scale pitches (C4 to C5)
-        scale_pitches = [60, 62, 64, 65, 67, 69, 71, 72]
-        
-        for _ in range(self.max_steps):
-            pitch = np.random.choice(scale_pitches)
-            melody.append(pitch)
-        
-        return melody
+        return self._rng.choice(self._scale, size=self.max_steps)
     
     def render(self, mode='human'):
         """
@@ -220,9 +372,9 @@ class HarmonizationEnvironment(gym.Env):
         """
         if mode == 'human':
             print(f"Step: {self.current_step}/{self.max_steps}")
-            print(f"Current sequence length: {len(self.current_sequence)}")
+            print(f"Current sequence length: {self._num_notes}")
             print(f"Episode rewards: {self.episode_rewards}")
-            if self.melody_context and self.current_step < len(self.melody_context):
+            if self.current_step < len(self.melody_context):
                 print(f"Melody note: {self.melody_context[self.current_step]}")
     
     def get_final_sequence(self) -> list:
@@ -232,7 +384,20 @@ class HarmonizationEnvironment(gym.Env):
         Returns:
             Final sequence as list of note dictionaries
         """
-        return self.current_sequence
+        n = self._num_notes
+        return [
+            {
+                'pitch': pitch,
+                'start_time': start_time,
+                'end_time': end_time,
+                'velocity': 80,
+                'voice': voice
+            }
+            for pitch, start_time, end_time, voice in zip(
+                self._pitches[:n].tolist(), self._starts[:n].tolist(),
+                self._ends[:n].tolist(), self._voices[:n].tolist()
+            )
+        ]
     
     def set_reward_weights(self, weights: Dict[str, float]):
         """
@@ -260,4 +425,5 @@ class HarmonizationEnvironment(gym.Env):
             melody_sequence: List of MIDI pitches
         """
         self.melody_sequence = melody_sequence
-        self.melody_context = melody_sequence[:self.max_steps] 
\ No newline at end of file
+        self.melody_context = melody_sequence[:self.max_steps]
+        self._fill_melody_observation()
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Numba kernels for the simplified music theory rewards.
+
+The kernels mirror the ``_*_simple`` methods of MusicTheoryRewards on plain
+NumPy arrays so the per-step reward can run as compiled code. Numba is
+optional: without it ``njit`` is a no-op and ``NUMBA_AVAILABLE`` is False,
+in which case MusicTheoryRewards keeps using its Python methods.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Order of the weights array passed to calc_reward_core()
+RULE_ORDER = (
+    'avoid_repetition',
+    'prefer_common_intervals',
+    'prefer_common_chords',
+    'prefer_scale_degrees',
+    'prefer_voice_leading'
+)
+
+# Root-position triad chroma masks (bits for root, third and fifth)
+MAJOR_TRIAD_MASK = 0b000010010001
+MINOR_TRIAD_MASK = 0b000010001001
+
+def _build_chord_score_lut():
+    """
+    Chord score of every 12-bit chroma.
+
+    A chroma scores 0.3 if some rotation of it contains a major or minor
+    triad (root, third, fifth), so inversions and doubled notes count too.
+    """
+    chromas = np.arange(4096)
+    lut = np.zeros(4096)
+    for root in range(12):
+        rotated = ((chromas >> root) | (chromas << (12 - root))) & 0xFFF
+        has_triad = ((rotated & MAJOR_TRIAD_MASK) == MAJOR_TRIAD_MASK) | ((rotated & MINOR_TRIAD_MASK) == MINOR_TRIAD_MASK)
+        lut[has_triad] = 0.3
+    return lut
+
+# Chord score indexed by chroma, read by calc_reward_core and MusicTheoryRewards
+CHORD_SCORE_LUT = _build_chord_score_lut()
+
+@njit(cache=True, error_model='numpy')
+def calc_reward_core(note_pitches, note_voices, n, action, melody_pitch, weights,
+                     consonant_mask, dissonant_mask, major_mask):
+    """
+    Weighted sum of the simplified rewards for one step.
+
+    Args:
+        note_pitches: MIDI pitches of the notes so far
+        note_voices: Voice index of each note
+        n: Number of notes
+        action: Pitch indices chosen for each voice
+        melody_pitch: Current melody pitch, 0 when there is none
+        weights: Rule weights in RULE_ORDER
+        consonant_mask: 12-bit mask of consonant interval classes
+        dissonant_mask: 12-bit mask of dissonant interval classes
+        major_mask: 12-bit mask of major scale pitch classes
+
+    Returns:
+        Total reward value
+    """
+    num_voices = action.shape[0]
+    pitches = action + 21
+    total = 0.0
+
+    # avoid_repetition (rules with zero weight are skipped)
+    if n > 0 and weights[0] != 0.0:
+        last_pitch = note_pitches[n - 1]
+        repeated = False
+        for v in range(num_voices):
+            if pitches[v] == last_pitch:
+                repeated = True
+        total += weights[0] * (-0.5 if repeated else 0.1)
+
+    if num_voices == 0:
+        return total
+
+    # One pass over the voices for the interval, chord and scale degree rules
+    interval_score = 0.0
+    scale_score = 0.0
+    chroma = 0
+    for v in range(num_voices):
+        pitch_class = pitches[v] % 12
+        chroma |= 1 << pitch_class
+        if (major_mask >> pitch_class) & 1:
+            scale_score += 0.1
+        if melody_pitch != 0:
+            interval = abs(pitches[v] - melody_pitch) % 12
+            if (consonant_mask >> interval) & 1:
+                interval_score += 0.2
+            elif (dissonant_mask >> interval) & 1:
+                interval_score -= 0.1
+
+    # prefer_common_intervals
+    if melody_pitch != 0:
+        total += weights[1] * interval_score / num_voices
+
+    # prefer_common_chords
+    if num_voices >= 3 and weights[2] != 0.0:
+        total += weights[2] * CHORD_SCORE_LUT[chroma]
+
+    # prefer_scale_degrees
+    total += weights[3] * scale_score / num_voices
+
+    # prefer_voice_leading: harmony voices of the last num_voices notes
+    if n > 0 and weights[4] != 0.0:
+        start = max(0, n - num_voices)
+        harmony_count = 0
+        for i in range(start, n):
+            if note_voices[i] > 0:
+                harmony_count += 1
+        if harmony_count == num_voices:
+            score = 0.0
+            v = 0
+            for i in range(start, n):
+                if note_voices[i] > 0:
+                    interval = abs(pitches[v] - note_pitches[i])
+                    if interval <= 2:
+                        score += 0.2
+                    elif interval <= 7:
+                        score += 0.1
+                    else:
+                        score -= 0.1
+                    v += 1
+            total += weights[4] * score / num_voices
+
+    return total
@@ -5,23 +5,41 @@ This module implements the reward functions from RL Tuner with adjustable weight
 to allow different musical styles and preferences.
 """
 
+import logging
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Set
 
+from ._rewards_numba import (
+    NUMBA_AVAILABLE, RULE_ORDER, CHORD_SCORE_LUT,
+    calc_reward_core as _calc_reward_core
+)
+
+log = logging.getLogger(__name__)
+
 class MusicTheoryRewards:
     """
     Tunable music theory reward system.
     
     Implements the reward functions from RL Tuner with configurable weights
     to allow different musical styles and preferences.
+    
+    Change weights through set_style_preset/set_custom_weights so the cached
+    weight vector used by calculate_reward_simple stays in sync.
     """
     
-    def __init__(self, reward_weights: Optional[Dict[str, float]] = None):
+    # Rules scored by calculate_reward_simple, in weight vector order
+    _RULE_ORDER = RULE_ORDER
+    
+    # Chord score of every 12-bit chroma, built once at import
+    _CHORD_SCORE_LUT = CHORD_SCORE_LUT
+    
+    def __init__(self, reward_weights: Optional[Dict[str, float]] = None, max_voices: int = 4):
         """
         Initialize the reward system.
         
         Args:
             reward_weights: Dictionary of reward weights for different rules
+            max_voices: Largest action size scored without allocating
         """
         # Default weights (from RL Tuner paper)
         self.default_weights = {
@@ -96,6 +114,49 @@ class MusicTheoryRewards:
         # Common intervals (in semitones)
         self.CONSONANT_INTERVALS = {0, 3, 4, 7, 8, 12}  # Unison, minor/major third, perfect fourth/fifth, octave
         self.DISSONANT_INTERVALS = {1, 2, 5, 6, 9, 10, 11}  # Minor second, major second, tritone, etc.
+        
+        # 12-bit pitch/interval class masks (bit i set for class i)
+        self._consonant_mask = self._pitch_class_mask(self.CONSONANT_INTERVALS)
+        self._dissonant_mask = self._pitch_class_mask(self.DISSONANT_INTERVALS)
+        self._major_mask = self._pitch_class_mask(self.MAJOR_SCALE)
+        self._minor_mask = self._pitch_class_mask(self.MINOR_SCALE)
+        
+        # Interval score of every (pitch, melody pitch) pair of MIDI notes:
+        # 0.2 for consonant, -0.1 for dissonant interval classes
+        interval_classes = np.abs(np.subtract.outer(np.arange(128), np.arange(128))) % 12
+        consonant = (np.right_shift(self._consonant_mask, interval_classes) & 1).astype(bool)
+        dissonant = (np.right_shift(self._dissonant_mask, interval_classes) & 1).astype(bool)
+        self._interval_score = np.where(consonant, 0.2, np.where(dissonant, -0.1, 0.0))
+        
+        # Voice leading score by motion size: step (<= 2), leap (<= 7), large leap
+        self._vl_thr = np.array([2, 7], dtype=np.int16)
+        self._vl_val = np.array([0.2, 0.1, -0.1])
+        
+        # Scratch buffer for the action's MIDI pitches in the Python reward path
+        self._action_scratch = np.empty(max_voices, dtype=np.int16)
+        
+        self._update_weight_vec()
+        
+        # Per-style (rules set, weights) over _RULE_ORDER, so switching
+        # presets only merges two small vectors
+        self._style_weight_vecs = {}
+        for style, preset in self.style_presets.items():
+            mask = np.array([rule in preset for rule in self._RULE_ORDER])
+            values = np.array([preset.get(rule, 0.0) for rule in self._RULE_ORDER])
+            self._style_weight_vecs[style] = (mask, values)
+        
+        if NUMBA_AVAILABLE:
+            # Compile (or load from cache) now rather than on the first training step
+            self.calculate_reward_simple(
+                np.zeros(1, dtype=np.int16), np.zeros(1, dtype=np.int16), np.zeros(3, dtype=np.int64), 60
+            )
+    
+    @staticmethod
+    def _pitch_class_mask(pitch_classes) -> int:
+        """
+        12-bit mask with bit i set for each pitch (or interval) class i.
+        """
+        return sum(1 << pc for pc in set(pitch_classes) if pc < 12)
     
     def set_style_preset(self, style: str):
         """
@@ -106,9 +167,12 @@ class MusicTheoryRewards:
         """
         if style in self.style_presets:
             self.weights.update(self.style_presets[style])
-            print(f"✅ Applied {style} style preset")
+            mask, values = self._style_weight_vecs[style]
+            self._weight_vec = np.where(mask, values, self._weight_vec)
+            self._update_active_rules()
+            log.debug("Applied %s style preset", style)
         else:
-            print(f"❌ Unknown style: {style}")
+            log.warning("Unknown style: %s", style)
     
     def set_custom_weights(self, weights: Dict[str, float]):
         """
@@ -118,232 +182,216 @@ class MusicTheoryRewards:
             weights: Dictionary of reward weights
         """
         self.weights.update(weights)
-        print("✅ Applied custom reward weights")
+        self._update_weight_vec()
+        log.debug("Applied custom reward weights")
+    
+    def _update_weight_vec(self):
+        """
+        Rebuild the dense weight vector of the simple rules from self.weights.
+        """
+        self._weight_vec = np.array([self.weights.get(rule, 0.0) for rule in self._RULE_ORDER])
+        self._update_active_rules()
+    
+    def _update_active_rules(self):
+        """
+        Record the indices of the simple rules with a non-zero weight.
+        """
+        self._active_rules = tuple(np.flatnonzero(self._weight_vec).tolist())
+    
+    def kernel_arguments(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Weights and pitch class masks for the compiled reward kernel.
+        
+        Returns:
+            (weights in RULE_ORDER, consonant mask, dissonant mask, major mask)
+        """
+        return self._weight_vec, self._consonant_mask, self._dissonant_mask, self._major_mask
     
     def calculate_reward_simple(self, 
-                              current_sequence: list,
+                              pitches: np.ndarray,
+                              voices: np.ndarray,
                               action: np.ndarray,
                               melody_note: Optional[int] = None) -> float:
         """
         Calculate a simplified reward for an action.
         
         Args:
-            current_sequence: Current sequence as list of note dictionaries
+            pitches: MIDI pitches of the notes so far
+            voices: Voice index of each note in ``pitches``
             action: Action taken (array of pitch indices)
             melody_note: Current melody note (optional)
             
         Returns:
             Total reward value
         """
-        total_reward = 0.0
+        if NUMBA_AVAILABLE:
+            return _calc_reward_core(
+                pitches, voices, len(pitches), np.asarray(action, dtype=np.int64),
+                int(melody_note) if melody_note else 0, *self.kernel_arguments()
+            )
         
-        # Convert action to MIDI pitches
-        action_pitches = [pitch_idx + 21 for pitch_idx in action]
+        # Convert action to MIDI pitches, in the scratch buffer when it fits
+        action = np.asarray(action)
+        if action.size <= self._action_scratch.size:
+            action_pitches = self._action_scratch[:action.size]
+            np.add(action, 21, out=action_pitches, casting='unsafe')
+        else:
+            action_pitches = action.astype(np.int16) + np.int16(21)
         
-        # Basic harmony rewards
-        rewards = {
-            'avoid_repetition': self._avoid_repetition_simple(current_sequence, action_pitches),
-            'prefer_common_intervals': self._prefer_common_intervals_simple(action_pitches, melody_note),
-            'prefer_common_chords': self._prefer_common_chords_simple(action_pitches),
-            'prefer_scale_degrees': self._prefer_scale_degrees_simple(action_pitches),
-            'prefer_voice_leading': self._prefer_voice_leading_simple(current_sequence, action_pitches)
-        }
+        # Pitch classes shared by the chord and scale degree rules
+        pitch_classes = action_pitches % 12
         
-        # Apply weights and sum
-        for rule_name, reward_value in rewards.items():
-            if rule_name in self.weights:
-                total_reward += self.weights[rule_name] * reward_value
+        # Basic harmony rewards in _RULE_ORDER, skipping rules with zero weight
+        active = self._active_rules
+        rewards = np.zeros(len(self._RULE_ORDER))
+        if 0 in active:
+            rewards[0] = self._avoid_repetition_simple(pitches, action_pitches)
+        if 1 in active:
+            rewards[1] = self._prefer_common_intervals_simple(action_pitches, melody_note)
+        if 2 in active:
+            rewards[2] = self._prefer_common_chords_simple(pitch_classes)
+        if 3 in active:
+            rewards[3] = self._prefer_scale_degrees_simple(pitch_classes)
+        if 4 in active:
+            rewards[4] = self._prefer_voice_leading_simple(pitches, voices, action_pitches)
         
-        return total_reward
+        # Apply weights and sum
+        return float(np.dot(self._weight_vec, rewards))
     
-    def _avoid_repetition_simple(self, current_sequence: list, action_pitches: list) -> float:
+    def _avoid_repetition_simple(self, pitches: np.ndarray, action_pitches: np.ndarray) -> float:
         """
         Simple reward for avoiding repetitive patterns.
         """
-        if len(current_sequence) == 0:
+        if len(pitches) == 0:
             return 0.0
         
-        # Get recent pitches
-        recent_pitches = [note['pitch'] for note in current_sequence[-4:]]
-        
-        # Check for immediate repetition
-        if recent_pitches and action_pitches:
-            if recent_pitches[-1] in action_pitches:
-                return -0.5
+        # Check for immediate repetition of the last note played
+        if action_pitches.size and pitches[-1] in action_pitches:
+            return -0.5
         
         return 0.1  # Small positive reward for variety
     
-    def _prefer_common_intervals_simple(self, action_pitches: list, melody_note: Optional[int]) -> float:
+    def _prefer_common_intervals_simple(self, action_pitches: np.ndarray, melody_note: Optional[int]) -> float:
         """
         Simple reward for consonant intervals with melody.
         """
-        if not melody_note or not action_pitches:
+        if not melody_note or action_pitches.size == 0:
             return 0.0
         
-        total_reward = 0.0
-        
-        for harmony_pitch in action_pitches:
-            interval = abs(harmony_pitch - melody_note) % 12
-            if interval in self.CONSONANT_INTERVALS:
-                total_reward += 0.2
-            elif interval in self.DISSONANT_INTERVALS:
-                total_reward -= 0.1
-        
-        return total_reward / len(action_pitches) if action_pitches else 0.0
+        return float(self._interval_score[action_pitches, melody_note].mean())
     
-    def _prefer_common_chords_simple(self, action_pitches: list) -> float:
+    def _prefer_common_chords_simple(self, pitch_classes: np.ndarray) -> float:
         """
         Simple reward for common chord structures.
         """
-        if len(action_pitches) < 3:
+        if pitch_classes.size < 3:
             return 0.0
         
-        # Check if pitches form a major or minor chord
-        pitches_mod12 = [p % 12 for p in action_pitches]
-        pitches_mod12.sort()
+        # 12-bit chroma of the sounding pitch classes
+        chroma = int(np.bitwise_or.reduce(np.left_shift(np.uint16(1), pitch_classes.astype(np.uint16))))
         
-        # Major chord: root, major third (4 semitones), perfect fifth (7 semitones)
-        if len(pitches_mod12) >= 3:
-            root = pitches_mod12[0]
-            third = pitches_mod12[1]
-            fifth = pitches_mod12[2]
-            
-            # Check for major chord
-            if (third - root) % 12 == 4 and (fifth - root) % 12 == 7:
-                return 0.3
-            # Check for minor chord
-            elif (third - root) % 12 == 3 and (fifth - root) % 12 == 7:
-                return 0.3
-        
-        return 0.0
+        return float(self._CHORD_SCORE_LUT[chroma])
     
-    def _prefer_scale_degrees_simple(self, action_pitches: list) -> float:
+    def _prefer_scale_degrees_simple(self, pitch_classes: np.ndarray) -> float:
         """
         Simple reward for scale degrees.
         """
-        if not action_pitches:
+        if pitch_classes.size == 0:
             return 0.0
         
-        total_reward = 0.0
-        
-        for pitch in action_pitches:
-            pitch_class = pitch % 12
-            if pitch_class in self.MAJOR_SCALE:
-                total_reward += 0.1
-        
-        return total_reward / len(action_pitches)
+        return 0.1 * float((np.right_shift(self._major_mask, pitch_classes) & 1).mean())
     
-    def _prefer_voice_leading_simple(self, current_sequence: list, action_pitches: list) -> float:
+    def _prefer_voice_leading_simple(self, pitches: np.ndarray, voices: np.ndarray, action_pitches: np.ndarray) -> float:
         """
         Simple reward for smooth voice leading.
         """
-        if len(current_sequence) == 0 or not action_pitches:
+        if len(pitches) == 0 or action_pitches.size == 0:
             return 0.0
         
-        # Get recent harmony notes
-        recent_harmony = []
-        for note in current_sequence[-len(action_pitches):]:
-            if note['voice'] > 0:  # Harmony voices
-                recent_harmony.append(note['pitch'])
-        
-        if len(recent_harmony) != len(action_pitches):
+        # Recent notes only count when all of them are harmony voices, so
+        # the slice can be compared directly instead of filtered into a copy
+        recent_pitches = pitches[-action_pitches.size:]
+        if recent_pitches.size != action_pitches.size or voices[-action_pitches.size:].min() <= 0:
             return 0.0
         
-        total_reward = 0.0
-        
         # Check for smooth voice leading (small intervals)
-        for old_pitch, new_pitch in zip(recent_harmony, action_pitches):
-            interval = abs(new_pitch - old_pitch)
-            if interval <= 2:  # Stepwise motion
-                total_reward += 0.2
-            elif interval <= 7:  # Reasonable leap
-                total_reward += 0.1
-            else:  # Large leap
-                total_reward -= 0.1
-        
-        return total_reward / len(action_pitches)
-    
-    # Keep the original methods for compatibility (they can be implemented later)
-    def calculate_reward(self, current_sequence, action, next_sequence):
-        """Original reward calculation method (placeholder)."""
-        return self.calculate_reward_simple([], action, None)
-    
-    def _avoid_repetition_reward(self, current, next_seq):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_arpeggios_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
+        intervals = np.abs(action_pitches - recent_pitches)
+        return float(self._vl_val[np.searchsorted(self._vl_thr, intervals)].mean())
     
-    def _prefer_scale_degrees_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_tonic_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_leading_tone_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_resolution_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_strong_beats_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_weak_beats_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_pitches_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_intervals_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_durations_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_rhythms_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_chords_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_progressions_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_voice_leading_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_harmony_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_melody_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
-    
-    def _prefer_common_counterpoint_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
+    def calculate_reward_batch(self, sequences: np.ndarray, melody: np.ndarray) -> np.ndarray:
+        """
+        Calculate the simplified rewards of a whole episode at once.
+        
+        Gives the rewards HarmonizationEnvironment.step produces for an
+        episode: each step records one note per voice (voice 0 first) and then
+        scores the action against the notes so far, which include the step's
+        own notes. So the last note played is always one of the action's
+        pitches (avoid_repetition scores -0.5) and the most recent notes
+        include voice 0 (prefer_voice_leading scores 0).
+        
+        Args:
+            sequences: Actions of shape (steps, voices), pitch indices per step
+            melody: Melody pitch per step, 0 where there is no melody note
+            
+        Returns:
+            Reward for each step
+        """
+        action_pitches = np.asarray(sequences, dtype=np.int16) + np.int16(21)
+        melody = np.asarray(melody, dtype=np.int16)
+        num_steps, num_voices = action_pitches.shape
+        rewards = np.zeros((num_steps, len(self._RULE_ORDER)))
+        if num_steps == 0 or num_voices == 0:
+            return rewards.sum(axis=1)
+        
+        # avoid_repetition: the last note played is the action's own last voice
+        rewards[:, 0] = -0.5
+        
+        # prefer_common_intervals
+        interval_scores = self._interval_score[action_pitches, melody[:, np.newaxis]]
+        rewards[:, 1] = np.where(melody != 0, interval_scores.mean(axis=1), 0.0)
+        
+        # prefer_common_chords
+        pitch_classes = action_pitches % 12
+        if num_voices >= 3:
+            chromas = np.bitwise_or.reduce(np.left_shift(np.uint16(1), pitch_classes.astype(np.uint16)), axis=1)
+            rewards[:, 2] = self._CHORD_SCORE_LUT[chromas]
+        
+        # prefer_scale_degrees
+        rewards[:, 3] = 0.1 * (np.right_shift(self._major_mask, pitch_classes) & 1).mean(axis=1)
+        
+        return rewards @ self._weight_vec
     
-    def _prefer_common_form_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0
+    # Keep the original entry point for compatibility
+    def calculate_reward(self, current_sequence, action, next_sequence):
+        """
+        Calculate the reward of an action played after a note sequence.
+        
+        Args:
+            current_sequence: Sequence the action follows (anything with ``.notes``)
+            action: Action taken (array of pitch indices)
+            next_sequence: Sequence after the action (unused by the simple rules)
+            
+        Returns:
+            Total reward value
+        """
+        pitches, voices = self._note_arrays(current_sequence)
+        return self.calculate_reward_simple(pitches, voices, action, None)
     
-    def _prefer_common_style_reward(self, sequence):
-        """Original method (placeholder)."""
-        return 0.0 
\ No newline at end of file
+    @staticmethod
+    def _note_arrays(sequence) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the pitches and voices (instruments) of a sequence's notes once.
+        
+        Args:
+            sequence: NoteSequence or any object with a ``notes`` list
+            
+        Returns:
+            (pitches, voices) as int16 arrays in note order
+        """
+        # Walk the (protobuf) repeated field once, reading both fields per note
+        notes = sequence.notes
+        records = np.fromiter(
+            ((note.pitch, note.instrument) for note in notes),
+            dtype=[('pitch', np.int16), ('voice', np.int16)], count=len(notes)
+        )
+        return np.ascontiguousarray(records['pitch']), np.ascontiguousarray(records['voice'])
@@ -27,6 +27,23 @@ sys.path.append('../src')
 
 from harmonization.core.rl_environment import HarmonizationEnvironment
 from harmonization.rewards.music_theory_rewards import MusicTheoryRewards
+from harmonization.rewards._rewards_numba import NUMBA_AVAILABLE, njit
+
+@njit(cache=True)
+def _contrary_motion_kernel(pitches, starts):
+    """
+    Compiled contrary motion pass, in place over the pitch array.
+    
+    Args:
+        pitches: MIDI pitch of each note, sorted by start time
+        starts: Start time of each note in seconds
+    """
+    for i in range(1, pitches.shape[0]):
+        pitch_diff = pitches[i] - pitches[i - 1]
+        if starts[i] - starts[i - 1] < 0.5 and abs(pitch_diff) < 3:
+            new_pitch = pitches[i] - 2 if pitch_diff > 0 else pitches[i] + 2
+            if 21 <= new_pitch <= 108:
+                pitches[i] = new_pitch
 
 class HybridHarmonizationTester:
     def __init__(self):
@@ -34,13 +51,18 @@ class HybridHarmonizationTester:
         self.server_url = "http://localhost:8000"
         self.test_midi_path = "realms2_idea.midi"  # Use existing test file
         
+        # One pooled HTTP session reused by every request to the server
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        
     def start_coconet_server(self):
         """Start the Coconet server in a subprocess"""
         print("🚀 Starting Coconet server...")
         
         # Check if server is already running
         try:
-            response = requests.get(f"{self.server_url}/status", timeout=5)
+            response = self.session.get(f"{self.server_url}/status", timeout=5)
             if response.status_code == 200:
                 print("✅ Coconet server is already running!")
                 return True
@@ -61,18 +83,27 @@ class HybridHarmonizationTester:
                 cwd=os.getcwd()
             )
             
-            # Wait for server to start
+            # Wait for server to start, polling with exponential backoff
+            # (50 ms up to 500 ms)
             print("⏳ Waiting for server to start...")
-            for i in range(30):  # Wait up to 30 seconds
+            start_time = time.monotonic()
+            delay = 0.05
+            reported = 0
+            while time.monotonic() - start_time < 30:  # Wait up to 30 seconds
                 try:
-                    response = requests.get(f"{self.server_url}/status", timeout=2)
+                    response = self.session.get(f"{self.server_url}/status", timeout=2)
                     if response.status_code == 200:
                         print("✅ Coconet server started successfully!")
                         return True
                 except requests.exceptions.RequestException:
                     pass
-                time.sleep(1)
-                print(f"   Waiting... ({i+1}/30)")
+                time.sleep(delay)
+                delay = min(delay * 1.5, 0.5)
+                
+                elapsed = int(time.monotonic() - start_time)
+                if elapsed > reported:
+                    reported = elapsed
+                    print(f"   Waiting... ({elapsed}/30s)")
             
             print("❌ Server failed to start within 30 seconds")
             return False
@@ -92,11 +123,14 @@ class HybridHarmonizationTester:
             except subprocess.TimeoutExpired:
                 print("⚠️  Server didn't stop gracefully, forcing...")
                 self.server_process.kill()
+        
+        # Release the pooled connections to the server
+        self.session.close()
     
     def check_server_status(self):
         """Check the status of the Coconet server"""
         try:
-            response = requests.get(f"{self.server_url}/status")
+            response = self.session.get(f"{self.server_url}/status")
             if response.status_code == 200:
                 status = response.json()
                 print("📊 Server Status:")
@@ -123,24 +157,26 @@ class HybridHarmonizationTester:
                     'num_steps': 512
                 }
                 
-                response = requests.post(
+                # Stream the response so the result is written as it arrives
+                with self.session.post(
                     f"{self.server_url}/generate_music",
                     files=files,
                     data=data,
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    # Save the harmonized result
-                    output_path = f"coconet_harmonized_{os.path.basename(midi_path)}"
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
-                    print(f"✅ Coconet harmonization saved: {output_path}")
-                    return output_path
-                else:
-                    print(f"❌ Coconet harmonization failed: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    return None
+                    timeout=60,
+                    stream=True
+                ) as response:
+                    if response.status_code == 200:
+                        # Save the harmonized result
+                        output_path = f"coconet_harmonized_{os.path.basename(midi_path)}"
+                        with open(output_path, 'wb') as out:
+                            for chunk in response.iter_content(chunk_size=64 * 1024):
+                                out.write(chunk)
+                        print(f"✅ Coconet harmonization saved: {output_path}")
+                        return output_path
+                    else:
+                        print(f"❌ Coconet harmonization failed: {response.status_code}")
+                        print(f"Response: {response.text}")
+                        return None
                     
         except Exception as e:
             print(f"❌ Failed to send melody to Coconet: {e}")
@@ -175,46 +211,34 @@ class HybridHarmonizationTester:
             # Load the MIDI file
             midi_data = pretty_midi.PrettyMIDI(midi_path)
             
-            # Extract notes from all tracks
-            all_notes = []
-            for instrument in midi_data.instruments:
-                for note in instrument.notes:
-                    all_notes.append({
-                        'pitch': note.pitch,
-                        'start': note.start,
-                        'end': note.end,
-                        'velocity': note.velocity,
-                        'instrument': instrument.name
-                    })
-            
-            # Sort notes by start time
-            all_notes.sort(key=lambda x: x['start'])
+            # Note arrays of all tracks, sorted by start time
+            notes = self._note_arrays(midi_data)
             
             # Apply contrary motion optimization
-            optimized_notes = self._optimize_contrary_motion(all_notes)
+            pitches = self._optimize_contrary_motion(notes['pitch'], notes['start'])
             
             # Create new MIDI with optimized notes
             optimized_midi = pretty_midi.PrettyMIDI()
             
-            # Group notes by instrument
-            instrument_notes = {}
-            for note in optimized_notes:
-                instrument_name = note['instrument']
-                if instrument_name not in instrument_notes:
-                    instrument_notes[instrument_name] = []
-                instrument_notes[instrument_name].append(note)
-            
-            # Add notes to instruments
-            for instrument_name, notes in instrument_notes.items():
-                instrument = pretty_midi.Instrument(name=instrument_name)
-                for note_data in notes:
-                    note = pretty_midi.Note(
-                        velocity=note_data['velocity'],
-                        pitch=note_data['pitch'],
-                        start=note_data['start'],
-                        end=note_data['end']
+            # Group the notes by instrument in one pass: a stable sort on the
+            # instrument index keeps each instrument's notes in start order
+            order = np.argsort(notes['instrument'], kind='stable')
+            instruments, group_starts = np.unique(notes['instrument'][order], return_index=True)
+            columns = zip(*(
+                np.split(values[order], group_starts[1:])
+                for values in (pitches, notes['start'], notes['end'], notes['velocity'])
+            ))
+            
+            # Add each source instrument's notes to a new instrument
+            for index, (group_pitches, starts, ends, velocities) in zip(instruments.tolist(), columns):
+                source = midi_data.instruments[index]
+                instrument = pretty_midi.Instrument(program=source.program, is_drum=source.is_drum, name=source.name)
+                instrument.notes = [
+                    pretty_midi.Note(velocity=velocity, pitch=pitch, start=start, end=end)
+                    for pitch, start, end, velocity in zip(
+                        group_pitches.tolist(), starts.tolist(), ends.tolist(), velocities.tolist()
                     )
-                    instrument.notes.append(note)
+                ]
                 optimized_midi.instruments.append(instrument)
             
             # Save optimized MIDI
@@ -227,39 +251,72 @@ class HybridHarmonizationTester:
             print(f"❌ Failed to apply RL optimization: {e}")
             return None
     
-    def _optimize_contrary_motion(self, notes):
-        """Apply contrary motion optimization to notes"""
-        if len(notes) < 2:
-            return notes
+    @staticmethod
+    def _note_arrays(midi_data):
+        """
+        Notes of all instruments as parallel arrays, sorted by start time.
+        
+        Args:
+            midi_data: Parsed PrettyMIDI object
+            
+        Returns:
+            Dict of 'pitch', 'start', 'end', 'velocity' and 'instrument'
+            (index into midi_data.instruments) arrays
+        """
+        count = sum(len(instrument.notes) for instrument in midi_data.instruments)
+        
+        def column(attribute, dtype):
+            values = (getattr(note, attribute) for instrument in midi_data.instruments for note in instrument.notes)
+            return np.fromiter(values, dtype=dtype, count=count)
+        
+        notes = {
+            'pitch': column('pitch', np.int16),
+            'start': column('start', np.float64),
+            'end': column('end', np.float64),
+            'velocity': column('velocity', np.int16),
+            'instrument': np.repeat(
+                np.arange(len(midi_data.instruments), dtype=np.int16),
+                [len(instrument.notes) for instrument in midi_data.instruments]
+            )
+        }
+        
+        # Stable sort keeps the instrument order for notes starting together
+        order = np.argsort(notes['start'], kind='stable')
+        return {name: values[order] for name, values in notes.items()}
+    
+    def _optimize_contrary_motion(self, pitches, starts):
+        """
+        Apply contrary motion optimization to notes.
         
-        optimized_notes = [notes[0]]  # Keep first note
+        Args:
+            pitches: MIDI pitch of each note, sorted by start time
+            starts: Start time of each note in seconds
+            
+        Returns:
+            Optimized pitches
+        """
+        if NUMBA_AVAILABLE:
+            optimized = pitches.copy()
+            _contrary_motion_kernel(optimized, np.asarray(starts, dtype=np.float64))
+            return optimized
         
-        for i in range(1, len(notes)):
-            current_note = notes[i]
-            prev_note = optimized_notes[-1]
-            
-            # Calculate pitch difference
-            pitch_diff = current_note['pitch'] - prev_note['pitch']
-            
-            # If notes are close in time and moving in same direction, adjust
-            time_diff = current_note['start'] - prev_note['start']
-            if time_diff < 0.5:  # Within 0.5 seconds
-                if abs(pitch_diff) < 3:  # Small interval
-                    # Try to create contrary motion
-                    if pitch_diff > 0:  # Moving up
-                        # Try moving down instead
-                        new_pitch = current_note['pitch'] - 2
-                        if 21 <= new_pitch <= 108:  # Valid MIDI range
-                            current_note['pitch'] = new_pitch
-                    else:  # Moving down
-                        # Try moving up instead
-                        new_pitch = current_note['pitch'] + 2
-                        if 21 <= new_pitch <= 108:  # Valid MIDI range
-                            current_note['pitch'] = new_pitch
-            
-            optimized_notes.append(current_note)
+        optimized = pitches.tolist()
         
-        return optimized_notes
+        # Start times are never changed, so the notes within 0.5 seconds of
+        # their predecessor can be found in one vectorized pass
+        close = np.flatnonzero(np.diff(starts) < 0.5) + 1
+        
+        # The pitch test compares against the previous *optimized* pitch, so
+        # it stays sequential, but only over the close notes
+        for i in close.tolist():
+            pitch_diff = optimized[i] - optimized[i-1]
+            if abs(pitch_diff) < 3:  # Small interval
+                # Try to create contrary motion: down when moving up, up otherwise
+                new_pitch = optimized[i] - 2 if pitch_diff > 0 else optimized[i] + 2
+                if 21 <= new_pitch <= 108:  # Valid MIDI range
+                    optimized[i] = new_pitch
+        
+        return np.array(optimized, dtype=pitches.dtype)
     
     def evaluate_harmonization(self, midi_path: str):
         """Evaluate the quality of a harmonization"""
@@ -268,48 +325,32 @@ class HybridHarmonizationTester:
         try:
             midi_data = pretty_midi.PrettyMIDI(midi_path)
             
-            # Extract notes
-            all_notes = []
-            for instrument in midi_data.instruments:
-                for note in instrument.notes:
-                    all_notes.append({
-                        'pitch': note.pitch,
-                        'start': note.start,
-                        'end': note.end
-                    })
-            
-            # Sort by start time
-            all_notes.sort(key=lambda x: x['start'])
+            # Note arrays sorted by start time
+            notes = self._note_arrays(midi_data)
+            pitches = notes['pitch']
             
             # Calculate metrics
             metrics = {
-                'total_notes': len(all_notes),
+                'total_notes': len(pitches),
                 'duration': midi_data.get_end_time(),
                 'contrary_motion_score': 0,
                 'voice_separation': 0,
                 'consonance_score': 0
             }
             
-            # Calculate contrary motion score
-            contrary_motion_count = 0
-            for i in range(1, len(all_notes)):
-                prev_pitch = all_notes[i-1]['pitch']
-                curr_pitch = all_notes[i]['pitch']
-                
-                # Check if moving in opposite direction
-                if (prev_pitch < curr_pitch and i > 1 and all_notes[i-2]['pitch'] > prev_pitch) or \
-                   (prev_pitch > curr_pitch and i > 1 and all_notes[i-2]['pitch'] < prev_pitch):
-                    contrary_motion_count += 1
+            # Calculate contrary motion score: consecutive moves in opposite
+            # directions (a repeated pitch breaks the pattern)
+            directions = np.sign(np.diff(pitches))
+            contrary_motion_count = int(np.count_nonzero(directions[1:] * directions[:-1] < 0))
             
-            metrics['contrary_motion_score'] = contrary_motion_count / max(1, len(all_notes) - 2)
+            metrics['contrary_motion_score'] = contrary_motion_count / max(1, len(pitches) - 2)
             
             # Calculate voice separation (if multiple instruments)
             if len(midi_data.instruments) > 1:
-                voice_ranges = []
-                for instrument in midi_data.instruments:
-                    if instrument.notes:
-                        pitches = [note.pitch for note in instrument.notes]
-                        voice_ranges.append(max(pitches) - min(pitches))
+                voice_ranges = [
+                    int(np.ptp(notes['pitch'][notes['instrument'] == index]))
+                    for index in np.unique(notes['instrument'])
+                ]
                 metrics['voice_separation'] = sum(voice_ranges) / len(voice_ranges)
             
             print(f"   Total notes: {metrics['total_notes']}")
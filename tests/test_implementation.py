@@ -71,16 +71,13 @@ def test_reward_system():
         print(f"   ✅ {style} style preset applied")
     
     # Test reward calculation
-    test_sequence = [
-        {'pitch': 60, 'start_time': 0.0, 'end_time': 0.25, 'velocity': 80, 'voice': 0},
-        {'pitch': 64, 'start_time': 0.0, 'end_time': 0.25, 'velocity': 80, 'voice': 1},
-        {'pitch': 67, 'start_time': 0.0, 'end_time': 0.25, 'velocity': 80, 'voice': 2}
-    ]
+    test_pitches = np.array([60, 64, 67], dtype=np.int16)
+    test_voices = np.array([0, 1, 2], dtype=np.int16)
     
     action = np.array([39, 43, 46])  # C major chord
     melody_note = 60  # C
     
-    reward = reward_system.calculate_reward_simple(test_sequence, action, melody_note)
+    reward = reward_system.calculate_reward_simple(test_pitches, test_voices, action, melody_note)
     print(f"   ✅ Reward calculation successful: {reward:.3f}")
     
     return True
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled reward kernels.
+
+Checks that the fast reward paths give the same values as the reference
+Python implementation in MusicTheoryRewards.
+"""
+
+import os
+import sys
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+def _random_step(rng):
+    """Random note arrays, action and melody note for one reward call."""
+    num_voices = int(rng.integers(1, 5))
+    num_notes = int(rng.integers(0, 12))
+
+    pitches = rng.integers(30, 90, num_notes).astype(np.int16)
+    voices = rng.integers(0, 4, num_notes).astype(np.int16)
+
+    action = rng.integers(10, 70, num_voices)
+    melody_note = [None, int(rng.integers(50, 80))][int(rng.integers(0, 2))]
+
+    return pitches, voices, action, melody_note
+
+def test_numba_kernel_matches_python():
+    """The Numba reward kernel must agree with the Python reward methods."""
+    print("🧪 Testing Numba reward kernel...")
+
+    from harmonization.rewards import music_theory_rewards
+    from harmonization.rewards.music_theory_rewards import MusicTheoryRewards
+
+    if not music_theory_rewards.NUMBA_AVAILABLE:
+        print("  ⚠️ Numba not available, skipping")
+        return True
+
+    rewards = MusicTheoryRewards()
+    rng = np.random.default_rng(0)
+
+    for i in range(500):
+        # Alternate between all rules active and some rules switched off
+        if i % 2:
+            rewards.set_custom_weights({'prefer_voice_leading': 0.2, 'avoid_repetition': 0.1, 'prefer_common_chords': 0.1})
+        else:
+            rewards.set_custom_weights({'prefer_voice_leading': 0.0, 'avoid_repetition': 0.0, 'prefer_common_chords': 0.0})
+        pitches, voices, action, melody_note = _random_step(rng)
+
+        compiled = rewards.calculate_reward_simple(pitches, voices, action, melody_note)
+        music_theory_rewards.NUMBA_AVAILABLE = False
+        try:
+            reference = rewards.calculate_reward_simple(pitches, voices, action, melody_note)
+        finally:
+            music_theory_rewards.NUMBA_AVAILABLE = True
+
+        assert abs(compiled - reference) < 1e-6, (pitches, voices, action, melody_note, compiled, reference)
+
+    print("  ✅ Numba kernel matches Python rewards")
+    return True
+
+def test_batch_rewards_match_per_step():
+    """calculate_reward_batch must agree with per-step calculate_reward_simple."""
+    print("🧪 Testing batched episode rewards...")
+
+    from harmonization.rewards.music_theory_rewards import MusicTheoryRewards
+
+    rewards = MusicTheoryRewards()
+    rewards.set_custom_weights({'prefer_voice_leading': 0.2})
+    rng = np.random.default_rng(1)
+
+    for _ in range(100):
+        num_steps = int(rng.integers(1, 33))
+        num_voices = int(rng.integers(1, 5))
+        sequences = rng.integers(10, 70, (num_steps, num_voices))
+        melody = np.where(rng.random(num_steps) < 0.8, rng.integers(50, 80, num_steps), 0)
+
+        batch = rewards.calculate_reward_batch(sequences, melody)
+
+        # Replay the episode the way HarmonizationEnvironment records notes
+        pitches = (sequences + 21).astype(np.int16).ravel()
+        voices = np.tile(np.arange(num_voices, dtype=np.int16), num_steps)
+        for step in range(num_steps):
+            # The environment records the step's notes before scoring it
+            n = (step + 1) * num_voices
+            expected = rewards.calculate_reward_simple(
+                pitches[:n], voices[:n], sequences[step], int(melody[step]) or None
+            )
+            assert abs(batch[step] - expected) < 1e-6, (step, batch[step], expected)
+
+    print("  ✅ Batched rewards match per-step rewards")
+    return True
+
+class _Note:
+    """Minimal stand-in for a NoteSequence note."""
+
+    def __init__(self, pitch, instrument):
+        self.pitch = pitch
+        self.instrument = instrument
+
+class _Sequence:
+    """Minimal stand-in for a NoteSequence."""
+
+    def __init__(self, notes):
+        self.notes = [_Note(pitch, instrument) for pitch, instrument in notes]
+
+def test_calculate_reward_uses_sequence():
+    """calculate_reward scores the action against the notes of current_sequence."""
+    print("🧪 Testing sequence-aware calculate_reward...")
+
+    from harmonization.rewards import music_theory_rewards
+    from harmonization.rewards.music_theory_rewards import MusicTheoryRewards
+
+    rewards = MusicTheoryRewards()
+    rewards.set_custom_weights({
+        'avoid_repetition': 1.0,
+        'prefer_common_intervals': 0.0,
+        'prefer_common_chords': 1.0,
+        'prefer_scale_degrees': 1.0,
+        'prefer_voice_leading': 1.0
+    })
+    action = np.array([39, 43, 46])  # C4, E4, G4
+
+    # (sequence notes as (pitch, instrument), expected reward)
+    cases = [
+        # No history: chord 0.3 + scale degrees 0.1
+        ([], 0.4),
+        # Last note repeated (-0.5), chord 0.3, scale 0.1, voices 1-3 held (+0.2)
+        ([(60, 1), (64, 2), (67, 3)], 0.1),
+        # Instrument 0 is the melody, so there is no voice leading term
+        ([(60, 0), (64, 1), (67, 2)], -0.1),
+        # Last note not in the action (+0.1), voices 1-3 leap by a fifth (+0.1)
+        ([(53, 1), (57, 2), (62, 3)], 0.6)
+    ]
+
+    numba_available = music_theory_rewards.NUMBA_AVAILABLE
+    try:
+        for use_numba in sorted({False, numba_available}):
+            music_theory_rewards.NUMBA_AVAILABLE = use_numba
+            for notes, expected in cases:
+                reward = rewards.calculate_reward(_Sequence(notes), action, None)
+                assert abs(reward - expected) < 1e-9, (use_numba, notes, reward, expected)
+    finally:
+        music_theory_rewards.NUMBA_AVAILABLE = numba_available
+
+    print("  ✅ calculate_reward matches the expected sequence-aware rewards")
+    return True
+
+def main():
+    """Run all tests."""
+    print("🎵 Reward Kernel Tests")
+    print("=" * 40)
+
+    tests = [
+        test_numba_kernel_matches_python,
+        test_batch_rewards_match_per_step,
+        test_calculate_reward_uses_sequence
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"  ❌ {test.__name__} failed: {e}")
+        print()
+
+    print("=" * 40)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    main()
@@ -108,6 +108,27 @@ def test_environment():
         print(f"  ❌ Environment test failed: {e}")
         return False
 
+def test_observation_not_aliased():
+    """Observations returned by reset/step must not change on later steps."""
+    print("🧪 Testing observation copies...")
+    
+    # Assertions propagate so pytest reports a failure; main() catches them
+    from harmonization.core.rl_environment import HarmonizationEnvironment
+    
+    env = HarmonizationEnvironment(max_steps=8, num_voices=4)
+    
+    # Agents keep the previous state for their updates
+    state = env.reset()
+    initial = state.copy()
+    next_state, reward, done, info = env.step(np.array([39, 43, 46, 51]))
+    
+    assert next_state is not state, "step() returned the reset() observation object"
+    assert np.array_equal(state, initial), "reset() observation changed after step()"
+    assert not np.array_equal(next_state, initial), "step() observation missing the new notes"
+    
+    print("  ✅ reset() observation unchanged after step()")
+    return True
+
 def test_coconet_wrapper():
     """Test the Coconet wrapper (without loading actual model)."""
     print("🧪 Testing Coconet Wrapper...")
@@ -241,6 +262,7 @@ def main():
     tests = [
         test_reward_system,
         test_environment,
+        test_observation_not_aliased,
         test_coconet_wrapper,
         test_integration,
         test_style_presets
@@ -250,8 +272,11 @@ def main():
     total = len(tests)
     
     for test in tests:
-        if test():
-            passed += 1
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"  ❌ {test.__name__} failed: {e}")
         print()
     
     print("=" * 40)